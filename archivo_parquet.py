@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Archivo columnar (Parquet) de cada tabla de ENARGAS ya parseada.
+
+Cada tabla leída de un .xls se guarda una vez, tipada, en
+
+    <carpeta>/practica=<práctica>/periodo=<año>/descarga-<AAAAMMDD>-<sha>.parquet
+
+con las columnas de la planilla más 'descarga' y 'sha256'. La próxima vez
+que hay que leer ese mismo contenido (reprocesos, backfills, --forzar) se
+lee el Parquet en lugar de volver a parsear el HTML, y el dataset entero se
+puede consultar con leer_archivo() para análisis.
+
+compactar() junta los archivos chicos de cada partición en uno nuevo y
+recién después borra los chicos; los compactos existentes no se reescriben.
+
+pyarrow es opcional: si no está instalado el archivo queda desactivado.
+ENARGAS_PARQUET fija la carpeta ("0" lo desactiva).
+"""
+import argparse
+import glob
+import json
+import os
+import re
+from datetime import datetime
+
+import pandas as pd
+
+from metricas import contar, medir
+
+CARPETA_PARQUET = os.getenv("ENARGAS_PARQUET", os.path.join("estado", "parquet"))
+
+PATRON_ARCHIVO = re.compile(r"^([a-z\-]+)-(\d{8})-\d{6}\.xls$", re.IGNORECASE)
+
+# Metadato del esquema con las columnas originales de cada descarga
+CLAVE_COLUMNAS = "enargas.columnas"
+
+# Particiones con menos archivos sueltos que esto no se compactan
+MINIMO_COMPACTAR = 8
+
+_pyarrow = None
+
+
+def _pa():
+    """Importa pyarrow la primera vez que hace falta. None si no está instalado."""
+    global _pyarrow
+    if _pyarrow is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+            _pyarrow = pyarrow
+        except ImportError:
+            print("⚠️ pyarrow no está instalado: no se archivan las tablas en Parquet", flush=True)
+            _pyarrow = False
+    return _pyarrow or None
+
+
+def archivo_activo(carpeta=CARPETA_PARQUET):
+    return carpeta != "0" and _pa() is not None
+
+
+def particion(ruta, periodo=None, carpeta=CARPETA_PARQUET):
+    """(carpeta de la partición, fecha de descarga AAAAMMDD) a partir del nombre del .xls."""
+    m = PATRON_ARCHIVO.match(os.path.basename(ruta))
+    if not m:
+        raise ValueError(f"Nombre de archivo inesperado: {ruta}")
+    practica, descarga = m.group(1).lower(), m.group(2)
+    if not periodo:
+        # Igual que el modo histórico: el año de la tabla es el de la descarga
+        periodo = int(descarga[:4])
+    return os.path.join(carpeta, f"practica={practica}", f"periodo={periodo}"), descarga
+
+
+def normalizar(df):
+    """
+    Mes como texto y el resto siempre float64, así todas las descargas tienen
+    el mismo esquema aunque una celda venga vacía o con texto ("-"), que queda
+    nulo como con pd.to_numeric(errors="coerce") en a_registros.
+    """
+    return pd.DataFrame({
+        str(c): s.astype(str) if c == "Mes" else pd.to_numeric(s, errors="coerce").astype("float64")
+        for c, s in df.items()
+    }, index=df.index)
+
+
+def _a_tabla(df, descarga, sha):
+    columnas = list(df.columns)
+    df = df.assign(descarga=pd.Timestamp(datetime.strptime(descarga, "%Y%m%d")).date(), sha256=sha)
+    tabla = _pa().Table.from_pandas(df, preserve_index=False)
+    # Las columnas que trajo esta descarga, en orden: en un compacto se suman las de las otras
+    metadatos = dict(tabla.schema.metadata or {})
+    metadatos[CLAVE_COLUMNAS] = json.dumps({sha: columnas}, ensure_ascii=False).encode("utf-8")
+    return tabla.replace_schema_metadata(metadatos)
+
+
+def _columnas(esquema):
+    """{sha: [columnas originales]} guardado en los metadatos del esquema."""
+    crudo = (esquema.metadata or {}).get(CLAVE_COLUMNAS.encode("utf-8"))
+    return json.loads(crudo) if crudo else {}
+
+
+def buscar(sha, directorio):
+    """DataFrame archivado para ese contenido (las columnas que trajo la descarga, normalizadas), o None."""
+    pa = _pa()
+    sueltos = glob.glob(os.path.join(directorio, f"descarga-*-{sha[:16]}.parquet"))
+    if sueltos:
+        tabla = pa.parquet.read_table(sueltos[0], memory_map=True)
+        columnas = _columnas(tabla.schema).get(sha)
+    else:
+        tabla = columnas = None
+        for compacto in glob.glob(os.path.join(directorio, "compacto-*.parquet")):
+            # Con las estadísticas por row group, el filtro solo lee lo que coincide
+            t = pa.parquet.read_table(compacto, filters=[("sha256", "=", sha)], memory_map=True)
+            if t.num_rows:
+                tabla = t
+                columnas = _columnas(pa.parquet.read_schema(compacto)).get(sha)
+                break
+    if tabla is None:
+        return None
+    df = tabla.to_pandas().drop(columns=["descarga", "sha256"])
+    if columnas is None:
+        # Archivado antes de guardar las columnas: lo nulo entero es relleno del compacto
+        return normalizar(df.dropna(axis=1, how="all"))
+    return normalizar(df[columnas])
+
+
+def guardar(df, sha, directorio, descarga):
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, f"descarga-{descarga}-{sha[:16]}.parquet")
+    # Con punto adelante, pyarrow.dataset no toma el temporal como parte del dataset.
+    # Con el pid, dos loaders que archivan el mismo contenido a la vez no se pisan el temporal
+    temporal = os.path.join(directorio, f".{os.path.basename(ruta)}.{os.getpid()}.tmp")
+    _pa().parquet.write_table(_a_tabla(normalizar(df), descarga, sha), temporal, compression="zstd")
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def tabla_archivada(ruta, sha, leer, periodo=None, carpeta=CARPETA_PARQUET):
+    """
+    Tabla completa de 'ruta': la archivada si ese contenido ya se parseó,
+    o leer(ruta) y se archiva para la próxima. En los dos casos sale normalizada.
+    El archivo es un cache: si falla, se avisa y se usa leer(ruta) igual.
+    """
+    directorio, descarga = particion(ruta, periodo, carpeta)
+    try:
+        with medir("parquet.buscar"):
+            df = buscar(sha, directorio)
+    except Exception as e:
+        print(f"⚠️ No pude leer el archivo Parquet de {os.path.basename(ruta)}: {e!r}", flush=True)
+        df = None
+    if df is not None:
+        contar("parquet.aciertos")
+        return df
+    df = normalizar(leer(ruta))
+    try:
+        with medir("parquet.guardar"):
+            guardar(df, sha, directorio, descarga)
+    except Exception as e:
+        print(f"⚠️ No pude archivar {os.path.basename(ruta)} en Parquet: {e!r}", flush=True)
+    return df
+
+
+def compactar(carpeta=CARPETA_PARQUET, minimo=MINIMO_COMPACTAR):
+    """Junta los archivos sueltos de cada partición en un compacto nuevo. Devuelve cuántos juntó."""
+    pa = _pa()
+    juntados = 0
+    for directorio in sorted(glob.glob(os.path.join(carpeta, "practica=*", "periodo=*"))):
+        sueltos = sorted(glob.glob(os.path.join(directorio, "descarga-*.parquet")))
+        if len(sueltos) < minimo:
+            continue
+        tablas = [pa.parquet.read_table(r) for r in sueltos]
+        # Las planillas de distintos días pueden traer columnas distintas (provincias nuevas),
+        # y los archivos de antes de fijar float64 pueden tener alguna columna int64
+        tabla = pa.concat_tables(tablas, promote_options="permissive").sort_by([("sha256", "ascending")])
+        columnas = {}
+        for t in tablas:
+            columnas.update(_columnas(t.schema))
+        tabla = tabla.replace_schema_metadata({
+            **(tabla.schema.metadata or {}),
+            CLAVE_COLUMNAS: json.dumps(columnas, ensure_ascii=False).encode("utf-8"),
+        })
+        destino = os.path.join(directorio, f"compacto-{datetime.now():%Y%m%d-%H%M%S}.parquet")
+        temporal = os.path.join(directorio, f".{os.path.basename(destino)}.tmp")
+        pa.parquet.write_table(tabla, temporal, compression="zstd", row_group_size=5000)
+        os.replace(temporal, destino)
+        for r in sueltos:
+            os.remove(r)
+        juntados += len(sueltos)
+        print(f"🗜️ {directorio}: {len(sueltos)} archivos -> {os.path.basename(destino)}", flush=True)
+    return juntados
+
+
+def leer_archivo(carpeta=CARPETA_PARQUET, practica=None, periodo=None):
+    """Todo el archivo (o una práctica / un período) como un DataFrame, con las columnas de partición."""
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(carpeta, format="parquet", partitioning="hive")
+    filtro = None
+    for campo, valor in (("practica", practica), ("periodo", periodo)):
+        if valor is not None:
+            condicion = ds.field(campo) == (int(valor) if campo == "periodo" else valor)
+            filtro = condicion if filtro is None else filtro & condicion
+    return dataset.to_table(filter=filtro).to_pandas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mantenimiento del archivo Parquet de tablas ENARGAS")
+    parser.add_argument("--carpeta", default=CARPETA_PARQUET)
+    parser.add_argument("--compactar", action="store_true", help="juntar los archivos chicos de cada partición")
+    parser.add_argument("--minimo", type=int, default=MINIMO_COMPACTAR,
+                        help="archivos sueltos necesarios para compactar una partición")
+    args = parser.parse_args()
+    if not archivo_activo(args.carpeta):
+        raise SystemExit(1)
+    if args.compactar:
+        print(f"✔️ Compactados {compactar(args.carpeta, args.minimo)} archivos", flush=True)
+    else:
+        df = leer_archivo(args.carpeta)
+        print(df.groupby(["practica", "periodo"]).agg(filas=("Mes", "size"), descargas=("descarga", "nunique")))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark de los motores de lectura, para elegir el orden de
+lector_enargas.MOTORES en cada formato.
+
+Mide cada motor instalado sobre copias de la planilla sintética de
+fixtures/ (HTML camuflado y xlsx) con todas las columnas y solo con las del catálogo; en los Excel,
+también declarando las columnas numéricas como Int64 de entrada (dtype de
+pd.read_excel), para ver si conviene tiparlas al leer. Los .xls binarios
+(BIFF) no se pueden generar sin la página, así que se miden solo si se pasa
+una carpeta con descargas reales en --xls.
+
+    python benchmarks/bench_lectores.py --archivos 50 [--xls carpeta_con_xls]
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.datos import COLUMNAS, copias_fixture  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from lector_enargas import (MOTORES, formato_archivo, leer_tabla_excel,  # noqa: E402
+                            leer_tabla_html, motor_disponible)
+
+# Lo que el loader pide: Mes y las provincias (el Total se descarta)
+COLUMNAS_CATALOGO = frozenset(c for c in COLUMNAS if c != "Total")
+
+
+def medir(rutas, lector, repeticiones=3):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        for ruta in rutas:
+            lector(ruta)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor
+
+
+def leer_tipado(ruta, motor, columnas):
+    """Como leer_tabla_excel con la poda del catálogo, pero con dtype Int64 declarado."""
+    return pd.read_excel(ruta, header=0, engine=motor, usecols=lambda c: c in columnas,
+                         dtype={c: "Int64" for c in columnas if c != "Mes"})
+
+
+def candidatos(formato):
+    """[(nombre, lector(ruta, columnas))] de los motores instalados para el formato."""
+    if formato == "html":
+        return [("lxml iterparse", lambda r, c: leer_tabla_html(r, columnas=c))]
+    return [(motor, lambda r, c, m=motor: leer_tabla_excel(r, m, c))
+            for motor in MOTORES[formato] if motor_disponible(motor)]
+
+
+def correr(archivos=50, carpeta_xls=None, repeticiones=3):
+    resultados = {}
+    with tempfile.TemporaryDirectory(prefix="bench-lectores-") as tmp:
+        conjuntos = {"html": copias_fixture(os.path.join(tmp, "html"), archivos, "html")}
+        try:
+            conjuntos["xlsx"] = copias_fixture(os.path.join(tmp, "xlsx"), archivos, "excel")
+        except ImportError as e:
+            print(f"⚠️ Sin xlsx: {e}", flush=True)
+        if carpeta_xls:
+            conjuntos["xls"] = [r for r in sorted(glob.glob(os.path.join(carpeta_xls, "*.xls")))
+                                if formato_archivo(r) == "xls"]
+
+        for formato, rutas in conjuntos.items():
+            if not rutas:
+                continue
+            for nombre, lector in candidatos(formato):
+                variantes = [("todas", lambda r: lector(r, None)),
+                             ("catálogo", lambda r: lector(r, COLUMNAS_CATALOGO))]
+                if formato != "html":
+                    variantes.append(("cat+Int64", lambda r, m=nombre: leer_tipado(r, m, COLUMNAS_CATALOGO)))
+                for poda, leer in variantes:
+                    segundos = medir(rutas, leer, repeticiones)
+                    resultados[(formato, nombre, poda)] = segundos
+                    print(f"{formato:<5} {nombre:<15} {poda:<10} {len(rutas):>5} arch  {segundos:8.3f}s  "
+                          f"{len(rutas) / segundos:9.1f} arch/s", flush=True)
+
+    for formato in ("xls", "xlsx"):
+        tiempos = {n: s for (f, n, p), s in resultados.items() if f == formato and p == "catálogo"}
+        if tiempos:
+            orden = sorted(tiempos, key=tiempos.get)
+            print(f"➡️ Orden sugerido para {formato}: {', '.join(orden)} (actual: {', '.join(MOTORES[formato])})")
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara los motores de lectura de planillas")
+    parser.add_argument("--archivos", type=int, default=50, help="copias de la planilla sintética por formato")
+    parser.add_argument("--xls", help="carpeta con .xls binarios reales para medir ese formato")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    correr(archivos=args.archivos, carpeta_xls=args.xls, repeticiones=args.repeticiones)
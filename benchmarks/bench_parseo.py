@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del parseo de planillas, sin red ni DB.
+
+Lee N copias de la planilla sintética de fixtures/ y un set sintético de
+varios años con leer_ultima_fila() (modo diario) y leer_tabla() (modo histórico), en las
+variantes HTML camuflado y Excel real, y reporta archivos/s y filas/s.
+
+    python benchmarks/bench_parseo.py --archivos 200 --anios 2019-2025
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.datos import VARIANTES, copias_fixture, generar_historico, rango_anios  # noqa: E402
+from lector_enargas import leer_tabla, leer_ultima_fila  # noqa: E402
+
+
+def medir_lectura(rutas, lector, repeticiones=3):
+    """Mejor tiempo de 'repeticiones' pasadas. Devuelve (segundos, filas leídas por pasada)."""
+    mejor, filas = float("inf"), 0
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        leidas = 0
+        for ruta in rutas:
+            resultado = lector(ruta)
+            leidas += len(resultado) if lector is leer_tabla else 1
+        mejor = min(mejor, time.perf_counter() - t0)
+        filas = leidas
+    return mejor, filas
+
+
+def reportar(nombre, rutas, segundos, filas):
+    print(f"{nombre:<34} {len(rutas):>6} arch  {filas:>7} filas  {segundos:8.3f}s  "
+          f"{len(rutas) / segundos:9.1f} arch/s  {filas / segundos:10.1f} filas/s", flush=True)
+
+
+def correr(archivos=100, anios=range(2019, 2026), variantes=VARIANTES, repeticiones=3):
+    resultados = {}
+    with tempfile.TemporaryDirectory(prefix="bench-parseo-") as tmp:
+        for variante in variantes:
+            try:
+                copias = copias_fixture(os.path.join(tmp, variante, "fixture"), archivos, variante)
+                sinteticos = generar_historico(os.path.join(tmp, variante, "historico"), anios, variante=variante)
+            except ImportError as e:
+                print(f"⚠️ Salteo la variante {variante}: {e}", flush=True)
+                continue
+            sinteticos = [r for rutas in sinteticos.values() for r in rutas]
+
+            for nombre, rutas, lector in (
+                (f"{variante} fixture  ultima_fila", copias, leer_ultima_fila),
+                (f"{variante} fixture  tabla", copias, leer_tabla),
+                (f"{variante} {len(anios)} años tabla", sinteticos, leer_tabla),
+            ):
+                segundos, filas = medir_lectura(rutas, lector, repeticiones)
+                reportar(nombre, rutas, segundos, filas)
+                resultados[nombre] = {"archivos": len(rutas), "filas": filas, "segundos": segundos}
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput del parseo de planillas ENARGAS")
+    parser.add_argument("--archivos", type=int, default=100, help="copias de la planilla sintética")
+    parser.add_argument("--anios", type=rango_anios, default=range(2019, 2026),
+                        help="años del set sintético, p. ej. 2019-2025")
+    parser.add_argument("--variante", choices=VARIANTES, action="append",
+                        help="solo esta variante (se puede repetir)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    correr(archivos=args.archivos, anios=args.anios, variantes=args.variante or VARIANTES,
+           repeticiones=args.repeticiones)
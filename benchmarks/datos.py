@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Datos para los benchmarks, todos sintéticos.
+
+fixtures/planilla_sintetica.xls imita el formato del .xls que baja de la
+página (HTML con dos tablas, mismas columnas y separador de miles), pero los
+números están inventados: no es una captura de ENARGAS y los volúmenes no
+son realistas. Sirve para medir el parseo, no para validar cuentas.
+
+Se generan en las dos variantes que distingue es_html_camuflado():
+- "html":  HTML con tablas, como el .xls de la página
+- "excel": un Excel de verdad (xlsx con extensión .xls, lo lee pd.read_excel),
+  escrito con openpyxl a partir de la planilla sintética
+
+No hay ningún .xls binario (BIFF, formato_archivo() == "xls", xlrd o
+calamine): ese camino no se mide acá. Para medirlo hay que pasarle
+descargas reales a bench_lectores.py --xls.
+"""
+import os
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+
+CARPETA_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PLANILLA_SINTETICA = os.path.join(CARPETA_FIXTURES, "planilla_sintetica.xls")
+
+VARIANTES = ("html", "excel")
+
+PRACTICAS = ["conversiones", "desmontajes", "revisiones", "modificaciones", "revisiones-cilindros", "crpc"]
+
+# Mismas columnas (y en el mismo orden) que la planilla sintética
+COLUMNAS = [
+    "Mes", "Buenos Aires", "Catamarca", "Chaco", "Chubut", "Capital Federal", "Córdoba",
+    "Corrientes", "Entre Ríos", "Formosa", "Jujuy", "La Pampa", "La Rioja", "Mendoza",
+    "Misiones", "Neuquén", "Río Negro", "Salta", "San Juan", "San Luis", "Santa Cruz",
+    "Santa Fe", "Sgo. del Estero", "T. del Fuego", "Tucumán", "Total",
+]
+
+MESES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio",
+         "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+
+
+def tabla_html(filas, titulo="ENARGAS"):
+    """Documento como el de la página: una tabla de encabezado y la de datos."""
+    partes = [
+        '<html>\n<head><meta http-equiv="Content-Type" content="text/html; charset=utf-8"></head>\n<body>\n',
+        f"<table>\n<tr><td><b>{titulo}</b></td></tr>\n</table>\n",
+        '<table border="1">\n<tr>' + "".join(f"<th>{c}</th>" for c in COLUMNAS) + "</tr>\n",
+    ]
+    for mes, *valores in filas:
+        celdas = "".join(f"<td>{v:,}</td>" for v in valores)
+        partes.append(f"<tr><td>{mes}</td>{celdas}</tr>\n")
+    partes.append("</table>\n</body>\n</html>\n")
+    return "".join(partes)
+
+
+def escribir_planilla(ruta, filas, variante="html"):
+    if variante == "html":
+        with open(ruta, "w", encoding="utf-8") as f:
+            f.write(tabla_html(filas))
+    elif variante == "excel":
+        # pd.read_excel mira el contenido y no la extensión, así que un xlsx llamado .xls sirve
+        pd.DataFrame(filas, columns=COLUMNAS).to_excel(ruta, index=False, engine="openpyxl")
+    else:
+        raise ValueError(f"Variante desconocida: {variante}")
+    return ruta
+
+
+def filas_fixture():
+    """Filas de la planilla sintética, como listas [mes, valores...]."""
+    from lector_enargas import leer_tabla
+    return leer_tabla(PLANILLA_SINTETICA)[COLUMNAS].values.tolist()
+
+
+def copias_fixture(carpeta, cantidad, variante="html"):
+    """'cantidad' copias de la planilla sintética con nombres distintos. Devuelve las rutas."""
+    os.makedirs(carpeta, exist_ok=True)
+    filas = filas_fixture() if variante == "excel" else None
+    with open(PLANILLA_SINTETICA, encoding="utf-8") as f:
+        contenido = f.read()
+
+    rutas = []
+    for i in range(cantidad):
+        descarga = date(2026, 3, 10) + timedelta(days=i)
+        ruta = os.path.join(carpeta, f"conversiones-{descarga:%Y%m%d}-090000.xls")
+        if variante == "html":
+            with open(ruta, "w", encoding="utf-8") as f:
+                f.write(contenido)
+        else:
+            escribir_planilla(ruta, filas, variante)
+        rutas.append(ruta)
+    return rutas
+
+
+def _filas_hasta(anio, hasta, practica, semilla=0):
+    """Tabla del año 'anio' al día 'hasta': meses cerrados completos y el actual a medias."""
+    r = random.Random(f"{semilla}-{practica}-{anio}")
+    ritmo = [r.randint(1, 300) for _ in COLUMNAS[1:-1]]
+    filas = []
+    for mes in range(1, hasta.month + 1):
+        fin = (date(anio, mes % 12 + 1, 1) if mes < 12 else date(anio + 1, 1, 1)) - timedelta(days=1)
+        dias = hasta.day if mes == hasta.month else fin.day
+        valores = [v * dias + (mes * v) % 7 for v in ritmo]
+        filas.append([MESES[mes - 1], *valores, sum(valores)])
+    return filas
+
+
+def generar_diario(carpeta, dias, desde=date(2024, 1, 1), practicas=PRACTICAS, variante="html"):
+    """
+    Una descarga por día y por práctica durante 'dias' días (puede cruzar años),
+    como las que deja la corrida diaria. Devuelve las rutas.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    rutas = []
+    for d in range(dias):
+        datos = desde + timedelta(days=d)
+        descarga = datos + timedelta(days=1)
+        for practica in practicas:
+            ruta = os.path.join(carpeta, f"{practica}-{descarga:%Y%m%d}-090000.xls")
+            rutas.append(escribir_planilla(ruta, _filas_hasta(datos.year, datos, practica), variante))
+    return rutas
+
+
+def generar_historico(carpeta, anios, practicas=PRACTICAS, variante="html"):
+    """
+    Tablas completas de cada año en carpeta/<anio>/, como las que deja
+    scraper_enargas.py --backfill. Devuelve {anio: [rutas]}.
+    """
+    resultado = {}
+    for anio in anios:
+        destino = os.path.join(carpeta, str(anio))
+        os.makedirs(destino, exist_ok=True)
+        fin = date(anio, 12, 31)
+        resultado[anio] = [
+            escribir_planilla(os.path.join(destino, f"{practica}-{anio + 1}0101-090000.xls"),
+                              _filas_hasta(anio, fin, practica), variante)
+            for practica in practicas
+        ]
+    return resultado
+
+
+def rango_anios(texto):
+    """'2019-2025' -> range(2019, 2026); un solo año ('2024') también vale. Para --anios."""
+    desde, _, hasta = texto.partition("-")
+    return range(int(desde), int(hasta or desde) + 1)
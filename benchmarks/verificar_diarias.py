@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chequeo de regresión de la diaria y el TOTAL vectorizados (calcular_diarias,
+agregar_total) contra el bucle por fila original, sin DB.
+
+cargar_acumulados_previos se reemplaza por una "DB" en memoria y se arman
+tandas con los casos que importan:
+- mismo mes: la diaria es la diferencia contra el anterior
+- cambio de mes: la diaria es el acumulado entero
+- anterior de la tanda vs anterior de la DB: gana el más reciente
+  (incluido un valor de la DB posterior al anterior de la tanda, como en --forzar)
+- histórico: filas de fin de mes y el mes en curso, desde registros_archivo
+  sobre la planilla sintética
+
+    python benchmarks/verificar_diarias.py [--semillas 20]
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import procesar_a_db  # noqa: E402
+from benchmarks.datos import COLUMNAS, PLANILLA_SINTETICA  # noqa: E402
+from procesar_a_db import ALIAS_PROVINCIAS, PROVINCIA_TOTAL, filas_desde_registros, registros_archivo  # noqa: E402
+
+PROVINCIAS = {ALIAS_PROVINCIAS.get(c, c): i for i, c in enumerate(COLUMNAS[1:-1], 1)}
+PROVINCIAS["Total"] = PROVINCIA_TOTAL
+
+
+def previos_en_memoria(en_db):
+    """Reemplazo de cargar_acumulados_previos sobre {(practica_id, provincia_id): {fecha: acumulado}}."""
+    def cargar(cur, claves):
+        previos = {}
+        for practica_id, fecha in set(claves):
+            por_prov = {}
+            for (p, provincia_id), serie in en_db.items():
+                anteriores = [f for f in serie if f < fecha]
+                if p == practica_id and anteriores:
+                    por_prov[provincia_id] = (max(anteriores), serie[max(anteriores)])
+            previos[(practica_id, fecha)] = por_prov
+        return previos
+    return cargar
+
+
+def filas_bucle(registros, en_db):
+    """El cálculo original: registro por registro, en orden de fecha, con acumulado_previo()."""
+    # Si la misma fecha viene en varios archivos, gana la última descarga
+    unicos = {}
+    for practica_id, fecha, valores in registros:
+        unicos[(practica_id, fecha)] = valores
+    cargados, filas = {}, []
+    for (practica_id, fecha), valores in sorted(unicos.items(), key=lambda x: x[0][1]):
+        fecha = fecha.date()
+        acumulado_total = diaria_total = 0
+        for col, val in valores.items():
+            provincia_id = PROVINCIAS.get(ALIAS_PROVINCIAS.get(col, col))
+            if provincia_id is None:
+                continue
+            actual = int(val) if pd.notna(val) else 0
+
+            candidato = None
+            serie = en_db.get((practica_id, provincia_id), {})
+            anteriores = [f for f in serie if f < fecha]
+            if anteriores:
+                candidato = (max(anteriores), serie[max(anteriores)])
+            for f, a in reversed(cargados.get((practica_id, provincia_id), [])):
+                if f < fecha:
+                    if candidato is None or f >= candidato[0]:
+                        candidato = (f, a)
+                    break
+
+            if candidato and (candidato[0].year, candidato[0].month) == (fecha.year, fecha.month):
+                diaria = actual - candidato[1]
+            else:
+                diaria = actual
+            filas.append((practica_id, provincia_id, fecha, actual, diaria))
+            cargados.setdefault((practica_id, provincia_id), []).append((fecha, actual))
+            if provincia_id <= 24:
+                acumulado_total += actual
+                diaria_total += diaria
+        filas.append((practica_id, PROVINCIA_TOTAL, fecha, acumulado_total, diaria_total))
+    return filas
+
+
+def tanda_diaria(semilla):
+    """Registros diarios de 2 prácticas alrededor de un cambio de mes, y una DB con lo anterior."""
+    r = random.Random(semilla)
+    provincias = COLUMNAS[1:-1]
+    en_db, registros = {}, []
+    for practica_id in (1, 2):
+        fechas = sorted(r.sample([date(2026, 2, 20) + timedelta(days=d) for d in range(20)], 9))
+        # Lo viejo ya está en la DB, fechas[2] se recarga y fechas[5] está solo en la DB,
+        # entre dos fechas de la tanda: para fechas[6] gana la DB
+        for f in fechas[:3] + fechas[5:6]:
+            for i in range(1, len(provincias) + 1):
+                en_db.setdefault((practica_id, i), {})[f] = r.randint(0, 5000)
+        for f in fechas[2:5] + fechas[6:]:
+            valores = {col: r.choice([r.randint(0, 5000), float("nan")]) if r.random() < 0.1
+                       else r.randint(0, 5000) for col in provincias}
+            valores["Provincia Inventada"] = 7
+            registros.append((practica_id, pd.Timestamp(f), valores))
+    r.shuffle(registros)
+    return registros, en_db
+
+
+def tanda_historica(semilla):
+    """Registros de registros_archivo en modo histórico (fin de mes y mes en curso), con algo en la DB."""
+    r = random.Random(semilla)
+    fecha_datos = date(2026, 3, 9)
+    registros, _ = registros_archivo((fecha_datos, PLANILLA_SINTETICA, 1, None, True, None, None))
+    en_db = {}
+    for i in range(1, 25):
+        if r.random() < 0.5:
+            en_db[(1, i)] = {date(2026, 3, 1): r.randint(0, 5000), date(2026, 1, 15): r.randint(0, 5000)}
+    return registros, en_db
+
+
+def comparar(nombre, registros, en_db):
+    procesar_a_db.cargar_acumulados_previos = previos_en_memoria(en_db)
+    vectorizado = sorted(filas_desde_registros(None, registros, PROVINCIAS))
+    esperado = sorted(filas_bucle(registros, en_db))
+    if vectorizado != esperado:
+        distintas = sorted(set(vectorizado) ^ set(esperado))[:5]
+        print(f"❌ {nombre}: {len(vectorizado)} filas vs {len(esperado)} del bucle. Ej.: {distintas}", flush=True)
+        return False
+    return True
+
+
+def correr(semillas=20):
+    original = procesar_a_db.cargar_acumulados_previos
+    try:
+        ok = all([comparar(f"diaria semilla {s}", *tanda_diaria(s)) for s in range(semillas)]
+                 + [comparar(f"histórico semilla {s}", *tanda_historica(s)) for s in range(semillas)])
+    finally:
+        procesar_a_db.cargar_acumulados_previos = original
+    print(f"{'✅' if ok else '❌'} diaria y TOTAL vectorizados vs bucle original: {semillas * 2} tandas", flush=True)
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara la diaria vectorizada con el bucle original")
+    parser.add_argument("--semillas", type=int, default=20, help="tandas aleatorias de cada modo")
+    args = parser.parse_args()
+    if not correr(args.semillas):
+        raise SystemExit(1)
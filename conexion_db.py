@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Acceso a la DB de Supabase: conexiones con keepalive, pool compartido entre
+hilos y reintentos con backoff (con jitter) ante fallas transitorias.
+
+Variables de entorno:
+- SUPABASE_URL / SUPABASE_KEY: URL de conexión (sin password) y password.
+- SUPABASE_CONEXION: "directa" (puerto de la URL, por defecto) o "pooler"
+  (transaction pooler de Supabase: SUPABASE_POOLER_URL, o el mismo host en el puerto 6543).
+- SUPABASE_SSLMODE: por defecto "require".
+"""
+import os
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import psycopg2
+from psycopg2 import errors, pool
+
+from metricas import medir
+from reintentos import con_reintentos as reintentar
+
+PUERTO_POOLER = 6543
+REINTENTOS = int(os.getenv("DB_REINTENTOS", "5"))
+
+# Fallas de la transacción que se resuelven repitiéndola
+ERRORES_TRANSITORIOS = (
+    psycopg2.OperationalError,
+    errors.SerializationFailure,
+    errors.DeadlockDetected,
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def parametros_conexion(modo=None):
+    url = os.getenv("SUPABASE_URL")
+    pwd = os.getenv("SUPABASE_KEY")
+    modo = modo or os.getenv("SUPABASE_CONEXION", "directa")
+
+    if not url or not pwd:
+        raise RuntimeError("Falta SUPABASE_URL o SUPABASE_KEY")
+
+    if modo not in ("directa", "pooler"):
+        raise ValueError(f"SUPABASE_CONEXION desconocida: {modo}")
+
+    pooler_url = os.getenv("SUPABASE_POOLER_URL")
+    if modo == "pooler" and pooler_url:
+        url = pooler_url
+    parsed = urlparse(url)
+    port = parsed.port
+    if modo == "pooler" and not pooler_url:
+        port = PUERTO_POOLER
+
+    print(f">>> conectar_db(): HOST={parsed.hostname}:{port}  USER={parsed.username}  MODO={modo}", flush=True)
+    return dict(
+        host     = parsed.hostname,
+        port     = port,
+        dbname   = parsed.path.lstrip("/"),
+        user     = parsed.username,
+        password = pwd,
+        sslmode  = os.getenv("SUPABASE_SSLMODE", "require"),
+        connect_timeout = 20,
+        # Que una conexión colgada se detecte en segundos y no al timeout del runner
+        keepalives = 1,
+        keepalives_idle = 30,
+        keepalives_interval = 10,
+        keepalives_count = 5,
+    )
+
+
+def con_reintentos(funcion, descripcion, reintentos=REINTENTOS, transitorios=ERRORES_TRANSITORIOS):
+    return reintentar(funcion, descripcion, lambda e: isinstance(e, transitorios), reintentos, "db.reintentos")
+
+
+def conectar_db(modo=None):
+    """Una conexión suelta, reintentando si el connect falla."""
+    params = parametros_conexion(modo)
+    return con_reintentos(lambda: psycopg2.connect(**params), "Conexión a la DB",
+                          transitorios=(psycopg2.OperationalError,))
+
+
+def obtener_pool(maxconn=None, modo=None):
+    """
+    Pool de conexiones compartido por todos los hilos del proceso.
+    maxconn pide al menos esa cantidad (si el pool ya existe, vale el tamaño con que se creó).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            params = parametros_conexion(modo)
+            maxconn = max(maxconn or 0, int(os.getenv("DB_POOL_MAX", "4")))
+            _pool = con_reintentos(lambda: pool.ThreadedConnectionPool(1, maxconn, **params),
+                                   "Conexión a la DB", transitorios=(psycopg2.OperationalError,))
+        return _pool
+
+
+def cerrar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+@contextmanager
+def conexion():
+    """Toma una conexión del pool y la devuelve al terminar (descartándola si quedó rota)."""
+    p = obtener_pool()
+    conn = con_reintentos(p.getconn, "Conexión a la DB", transitorios=(psycopg2.OperationalError,))
+    try:
+        yield conn
+    finally:
+        rota = bool(conn.closed)
+        if not rota:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                rota = True
+        p.putconn(conn, close=rota)
+
+
+def ejecutar_transaccion(funcion, reintentos=REINTENTOS):
+    """
+    Corre funcion(cur) dentro de una transacción y hace commit.
+    Si falla por algo transitorio (conexión caída, serialización, deadlock)
+    hace rollback y repite todo con otra conexión del pool.
+    """
+    def intento():
+        with medir("db.transaccion"), conexion() as conn:
+            with conn.cursor() as cur:
+                resultado = funcion(cur)
+            conn.commit()
+            return resultado
+
+    return con_reintentos(intento, "Transacción", reintentos=reintentos)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Descarga directa por HTTP de los Excel de ENARGAS, sin levantar Chrome.
+
+Lee el formulario de la página una sola vez (acción, campos ocultos y los
+valores de los <select> tipo-consulta-gnc / periodo / cuadro) y después
+manda el mismo POST que hace el botón "Ver Excel" por una sesión keep-alive.
+Si el servidor no devuelve una planilla (por ejemplo porque exige el token
+de reCAPTCHA) se lanza DescargaRechazada y el scraper usa Selenium.
+"""
+import os
+import re
+import unicodedata
+from datetime import datetime
+from urllib.parse import urljoin
+
+import requests
+from lxml import html
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metricas import contar, medir
+
+TIPO_CONSULTA = "Prácticas informadas por Tipo de Operación"
+
+CAMPOS_SELECT = ("tipo-consulta-gnc", "periodo", "cuadro")
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+
+class DescargaRechazada(Exception):
+    """El servidor no entregó el Excel por la vía directa."""
+
+
+def crear_sesion(pool=10):
+    """Sesión HTTP con conexiones persistentes y reintentos ante errores de red/5xx."""
+    sesion = requests.Session()
+    reintentos = Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                       allowed_methods=None)
+    adaptador = HTTPAdapter(pool_connections=pool, pool_maxsize=pool, max_retries=reintentos)
+    sesion.mount("https://", adaptador)
+    sesion.mount("http://", adaptador)
+    sesion.headers["User-Agent"] = USER_AGENT
+    return sesion
+
+
+def leer_formulario(sesion, url, timeout=30):
+    """
+    Baja la página y arma la descripción del formulario de descarga:
+    {"accion", "metodo", "ocultos": {name: value}, "boton": (name, value) o None,
+     "selects": {id: {"name": ..., "opciones": {texto: value}}}}
+    """
+    resp = sesion.get(url, timeout=timeout)
+    resp.raise_for_status()
+    if "charset" not in resp.headers.get("Content-Type", "").lower():
+        resp.encoding = resp.apparent_encoding
+    doc = html.fromstring(resp.text, base_url=url)
+
+    boton = doc.get_element_by_id("btn-ver-xls", None)
+    if boton is None:
+        raise DescargaRechazada("No encontré el botón btn-ver-xls en la página")
+    form = next((a for a in boton.iterancestors("form")), None)
+    if form is None:
+        # El botón puede estar fuera del <form> y referenciarlo con form="..."
+        form = doc.get_element_by_id(boton.get("form", ""), None)
+    if form is None:
+        raise DescargaRechazada("El botón btn-ver-xls no pertenece a ningún formulario")
+
+    selects = {}
+    for campo in CAMPOS_SELECT:
+        elem = doc.get_element_by_id(campo, None)
+        if elem is None:
+            raise DescargaRechazada(f"No encontré el select '{campo}'")
+        opciones = {}
+        for opt in elem.iter("option"):
+            texto = " ".join(opt.text_content().split())
+            opciones[texto] = opt.get("value", texto)
+        selects[campo] = {"name": elem.get("name", campo), "opciones": opciones}
+
+    ocultos = {
+        i.get("name"): i.get("value", "")
+        for i in form.iter("input")
+        if i.get("type", "").lower() == "hidden" and i.get("name")
+    }
+
+    return {
+        "accion": urljoin(url, boton.get("formaction") or form.get("action") or url),
+        "metodo": (boton.get("formmethod") or form.get("method") or "post").lower(),
+        "ocultos": ocultos,
+        "boton": (boton.get("name"), boton.get("value", "")) if boton.get("name") else None,
+        "selects": selects,
+    }
+
+
+def _valor_opcion(formulario, campo, texto):
+    opciones = formulario["selects"][campo]["opciones"]
+    if texto not in opciones:
+        raise DescargaRechazada(f"'{texto}' no figura entre las opciones de '{campo}'")
+    return opciones[texto]
+
+
+def _es_planilla(resp):
+    """Binario xls/xlsx, o HTML "camuflado" que el servidor manda como adjunto Excel."""
+    if resp.content.startswith((b"\xd0\xcf\x11\xe0", b"PK\x03\x04")):
+        return True
+    tipo = resp.headers.get("Content-Type", "").lower()
+    disposicion = resp.headers.get("Content-Disposition", "").lower()
+    return "attachment" in disposicion or "excel" in tipo or "spreadsheet" in tipo
+
+
+def _slug(texto):
+    texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "-", texto.lower()).strip("-")
+
+
+def _nombre_archivo(resp, cuadro):
+    disposicion = resp.headers.get("Content-Disposition", "")
+    m = re.search(r"filename\*?=(?:UTF-8'')?\"?([^\";]+)\"?", disposicion, re.IGNORECASE)
+    if m:
+        return os.path.basename(m.group(1).strip())
+    # Sin nombre del servidor: mismo formato que espera procesar_a_db
+    return f"{_slug(cuadro)}-{datetime.now():%Y%m%d-%H%M%S}.xls"
+
+
+def descargar_cuadro_http(sesion, formulario, cuadro, periodo, download_dir, timeout=60):
+    """Pide el Excel de un cuadro y lo guarda en download_dir. Devuelve la ruta."""
+    datos = dict(formulario["ocultos"])
+    for campo, texto in (("tipo-consulta-gnc", TIPO_CONSULTA), ("periodo", periodo), ("cuadro", cuadro)):
+        datos[formulario["selects"][campo]["name"]] = _valor_opcion(formulario, campo, texto)
+    if formulario["boton"]:
+        nombre, valor = formulario["boton"]
+        datos[nombre] = valor
+
+    if formulario["metodo"] == "get":
+        resp = sesion.get(formulario["accion"], params=datos, timeout=timeout)
+    else:
+        resp = sesion.post(formulario["accion"], data=datos, timeout=timeout)
+
+    if resp.status_code != 200 or not _es_planilla(resp):
+        raise DescargaRechazada(
+            f"{cuadro}: respuesta {resp.status_code} "
+            f"({resp.headers.get('Content-Type', 'sin content-type')}) no es una planilla"
+        )
+
+    ruta = os.path.join(download_dir, _nombre_archivo(resp, cuadro))
+    temporal = ruta + ".part"
+    with open(temporal, "wb") as f:
+        f.write(resp.content)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def descargar_estadisticas_http(url, cuadros, periodo, download_dir, sesion=None):
+    """
+    Intenta bajar todos los cuadros por HTTP directo.
+    Devuelve ({cuadro: ruta}, [cuadros rechazados]).
+    """
+    sesion = sesion or crear_sesion()
+    try:
+        with medir("scraper.formulario_http"):
+            formulario = leer_formulario(sesion, url)
+    except (requests.RequestException, DescargaRechazada) as e:
+        print(f"⚠️ Descarga directa no disponible: {e}", flush=True)
+        return {}, list(cuadros)
+
+    descargados, rechazados = {}, []
+    for cuadro in cuadros:
+        try:
+            with medir("scraper.cuadro_http"):
+                descargados[cuadro] = descargar_cuadro_http(sesion, formulario, cuadro, periodo, download_dir)
+            print(f"✅ Descargado (HTTP): {cuadro} -> {os.path.basename(descargados[cuadro])}", flush=True)
+        except (requests.RequestException, DescargaRechazada) as e:
+            print(f"⚠️ HTTP rechazado para {cuadro}: {e}", flush=True)
+            rechazados.append(cuadro)
+            contar("scraper.rechazados_http")
+    return descargados, rechazados
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Archivos JSON de estado/ (cache de Drive y de chromedriver, huellas,
+checkpoint del backfill, reportes de métricas).
+
+leer_json tolera que el archivo no exista o esté cortado; guardar_json
+escribe en un temporal y lo renombra, así una corrida cortada a la mitad
+nunca deja un JSON roto.
+"""
+import json
+import os
+
+
+def leer_json(ruta, defecto=None):
+    """Contenido del archivo, o 'defecto' ({} si no se pasa) si no existe o no es JSON válido."""
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {} if defecto is None else defecto
+
+
+def guardar_json(ruta, datos, ordenar=True):
+    carpeta = os.path.dirname(ruta)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False, indent=1, sort_keys=ordenar)
+    os.replace(temporal, ruta)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Huellas de lo que ENARGAS publicó en la última corrida, por período y cuadro.
+
+La huella es el SHA-256 de la tabla ya parseada (no del archivo: el HTML
+puede cambiar de bytes sin que cambien los datos). Si la descarga de hoy
+tiene la misma huella que la última que se procesó, el cuadro no tiene
+novedades y no hace falta subirlo ni cargarlo.
+"""
+import hashlib
+import os
+
+from estado_json import guardar_json, leer_json
+from lector_enargas import leer_tabla
+
+RUTA_HUELLAS = os.getenv("ENARGAS_HUELLAS", os.path.join("estado", "huellas.json"))
+
+
+def clave(periodo, cuadro):
+    return f"{periodo}|{cuadro}"
+
+
+def cargar_huellas(ruta=RUTA_HUELLAS):
+    return leer_json(ruta)
+
+
+def guardar_huellas(huellas, ruta=RUTA_HUELLAS):
+    guardar_json(ruta, huellas)
+
+
+def huella_tabla(ruta):
+    """Huella de los datos de la planilla, o None si no se pudo leer (se la trata como nueva)."""
+    try:
+        tabla = leer_tabla(ruta)
+    except Exception as e:
+        print(f"⚠️ No pude calcular la huella de {os.path.basename(ruta)}: {e!r}", flush=True)
+        return None
+    return hashlib.sha256(tabla.to_csv(index=False).encode("utf-8")).hexdigest()
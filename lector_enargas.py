@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Lectura rápida de los .xls "camuflados" de ENARGAS (HTML con tablas).
+
+pd.read_html arma un DataFrame por cada tabla del documento y después
+solo usamos la segunda y, de ella, la última fila. Acá se recorre el
+documento con lxml.iterparse, se toma el encabezado y las filas de la
+tabla pedida y se libera cada nodo apenas se lee.
+
+Los Excel de verdad se leen con pd.read_excel y el motor más rápido que
+esté instalado para su formato (MOTORES, medido con benchmarks/bench_lectores.py).
+"""
+import importlib.util
+import os
+
+import pandas as pd
+from lxml import etree
+
+from metricas import medir
+
+# Índice de la tabla con los datos (la 0 es el encabezado de la página)
+TABLA_DATOS = 1
+
+# Motores de pd.read_excel por formato, del más rápido al más lento. python-calamine y xlrd
+# están en requirements.txt; openpyxl es opcional (solo hace falta si falta calamine)
+MOTORES = {
+    "xls": ("calamine", "xlrd"),
+    "xlsx": ("calamine", "openpyxl"),
+}
+MODULOS_MOTOR = {"calamine": "python_calamine", "xlrd": "xlrd", "openpyxl": "openpyxl"}
+
+
+def es_html_camuflado(path):
+    with open(path, "rb") as f:
+        inicio = f.read(1024).lower()
+    return any(tag in inicio for tag in (b'<html', b'<table', b'<!doctype html'))
+
+
+def _texto(celda):
+    return " ".join("".join(celda.itertext()).split())
+
+
+def _a_numero(texto):
+    """Misma conversión que hace read_html: separador de miles ',' y NaN si está vacío."""
+    if texto == "":
+        return float("nan")
+    limpio = texto.replace(",", "")
+    try:
+        return int(limpio)
+    except ValueError:
+        pass
+    try:
+        return float(limpio)
+    except ValueError:
+        return texto
+
+
+def iterar_filas_html(ruta, indice_tabla=TABLA_DATOS):
+    """
+    Genera las filas (listas de textos) de la tabla número 'indice_tabla'
+    del documento, sin construir el resto del árbol.
+    """
+    tabla_actual = -1
+    profundidad = 0
+    with open(ruta, "rb") as f:
+        for evento, elem in etree.iterparse(f, events=("start", "end"), html=True, tag=("table", "tr")):
+            if elem.tag == "table":
+                if evento == "start":
+                    if profundidad == 0:
+                        tabla_actual += 1
+                    profundidad += 1
+                else:
+                    profundidad -= 1
+                    elem.clear()
+                    if profundidad == 0 and tabla_actual == indice_tabla:
+                        return
+                continue
+
+            if evento == "end":
+                if tabla_actual == indice_tabla and profundidad == 1:
+                    yield [_texto(c) for c in elem if c.tag in ("td", "th")]
+                # Las filas ya leídas no hacen falta más
+                elem.clear()
+
+
+def _completar(fila, largo):
+    """Completa con vacíos (NaN, como en read_html) las filas más cortas que el encabezado: pie, colspan."""
+    return fila + [""] * (largo - len(fila))
+
+
+def _columnas_a_leer(encabezado, columnas):
+    """Índices de las columnas pedidas (todas si columnas es None) y nombres de las descartadas."""
+    if columnas is None:
+        return list(range(len(encabezado))), []
+    indices = [i for i, c in enumerate(encabezado) if c in columnas]
+    return indices, [c for c in encabezado if c not in columnas]
+
+
+def leer_ultima_fila_html(ruta, indice_tabla=TABLA_DATOS, columnas=None):
+    """Equivalente a pd.read_html(ruta, header=0)[indice_tabla].iloc[-1], sin armar las tablas."""
+    encabezado, ultima = None, None
+    for fila in iterar_filas_html(ruta, indice_tabla):
+        if encabezado is None:
+            encabezado = fila
+        else:
+            ultima = fila
+    if encabezado is None or ultima is None:
+        raise ValueError(f"{ruta}: no encontré la tabla {indice_tabla} con datos")
+    ultima = _completar(ultima, len(encabezado))
+    indices, descartadas = _columnas_a_leer(encabezado, columnas)
+    serie = pd.Series([_a_numero(ultima[i]) for i in indices], index=[encabezado[i] for i in indices], dtype=object)
+    serie.attrs["descartadas"] = descartadas
+    return serie
+
+
+def leer_tabla_html(ruta, indice_tabla=TABLA_DATOS, columnas=None):
+    """Equivalente a pd.read_html(ruta, header=0)[indice_tabla], leyendo solo esa tabla."""
+    filas = iterar_filas_html(ruta, indice_tabla)
+    encabezado = next(filas, None)
+    if encabezado is None:
+        raise ValueError(f"{ruta}: no encontré la tabla {indice_tabla}")
+    indices, descartadas = _columnas_a_leer(encabezado, columnas)
+    # Con los valores ya convertidos, las columnas numéricas salen int64/float64 como en read_html
+    df = pd.DataFrame([[_a_numero(fila[i]) for i in indices]
+                       for fila in (_completar(f, len(encabezado)) for f in filas)],
+                      columns=[encabezado[i] for i in indices])
+    df.attrs["descartadas"] = descartadas
+    return df
+
+
+def formato_archivo(ruta):
+    """'html' (xls camuflado), 'xls' (BIFF/OLE), 'xlsx' (zip) o None si no se reconoce."""
+    with open(ruta, "rb") as f:
+        inicio = f.read(8)
+    if inicio.startswith(b"\xd0\xcf\x11\xe0"):
+        return "xls"
+    if inicio.startswith(b"PK\x03\x04"):
+        return "xlsx"
+    if es_html_camuflado(ruta):
+        return "html"
+    return None
+
+
+def motor_disponible(motor):
+    return importlib.util.find_spec(MODULOS_MOTOR[motor]) is not None
+
+
+def motor_lectura(formato):
+    """
+    Motor de pd.read_excel para el formato: el de ENARGAS_MOTOR_<FORMATO> si
+    está definido, si no el primero instalado de MOTORES (None = el de pandas).
+    """
+    elegido = os.getenv(f"ENARGAS_MOTOR_{(formato or '').upper()}")
+    if elegido:
+        return elegido
+    return next((m for m in MOTORES.get(formato, ()) if motor_disponible(m)), None)
+
+
+def leer_tabla_excel(ruta, motor=None, columnas=None):
+    """
+    Excel de verdad con pd.read_excel. Con 'columnas' solo se leen esas (las
+    demás quedan anotadas en attrs["descartadas"]).
+    No se le pasa dtype: las columnas de números ya salen int64 y declararlas
+    Int64 hace más lenta la lectura (variante cat+Int64 de benchmarks/bench_lectores.py).
+    """
+    descartadas = []
+
+    def usar(columna):
+        if columnas is None or columna in columnas:
+            return True
+        descartadas.append(columna)
+        return False
+
+    df = pd.read_excel(ruta, header=0, engine=motor, usecols=usar)
+    df.attrs["descartadas"] = list(dict.fromkeys(descartadas))
+    return df
+
+
+def leer_tabla(ruta, columnas=None, motor=None):
+    """
+    Tabla completa de un .xls de ENARGAS, sea HTML camuflado o Excel real.
+    columnas: si se pasa, solo se leen esas (las demás quedan en attrs["descartadas"]).
+    """
+    formato = formato_archivo(ruta)
+    if formato == "html":
+        with medir("parseo.html"):
+            return leer_tabla_html(ruta, columnas=columnas)
+    with medir(f"parseo.{formato or 'excel'}"):
+        return leer_tabla_excel(ruta, motor or motor_lectura(formato), columnas)
+
+
+def leer_ultima_fila(ruta, columnas=None, motor=None):
+    """Última fila (mes más reciente) de un .xls de ENARGAS."""
+    if formato_archivo(ruta) == "html":
+        with medir("parseo.html"):
+            return leer_ultima_fila_html(ruta, columnas=columnas)
+    df = leer_tabla(ruta, columnas, motor)
+    ultima = df.iloc[-1]
+    ultima.attrs["descartadas"] = df.attrs["descartadas"]
+    return ultima
+
+
+def podar(df, columnas):
+    """Deja solo las columnas pedidas de una tabla ya leída (p. ej. del archivo Parquet)."""
+    if columnas is None:
+        return df
+    podada = df[[c for c in df.columns if c in columnas]]
+    podada.attrs["descartadas"] = [c for c in df.columns if c not in columnas]
+    return podada
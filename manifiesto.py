@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Manifiesto local de contenidos ya procesados.
+
+Cada .xls descargado se identifica por el SHA-256 de su contenido y se anota
+qué etapas (subida a Drive, carga en la DB) ya lo vieron. Así, si ENARGAS
+publica la misma tabla que ayer, las etapas no vuelven a hacer nada.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+RUTA_MANIFIESTO = os.getenv("ENARGAS_MANIFIESTO", os.path.join("estado", "manifiesto.sqlite"))
+
+ETAPA_DRIVE = "drive"
+ETAPA_DB = "db"
+# La carga histórica escribe todos los meses de la tabla, no solo la última fila:
+# que el contenido ya se haya cargado en modo diario no la cubre
+ETAPA_DB_HISTORICO = ETAPA_DB + "-historico"
+
+_lock = threading.Lock()
+
+
+def hash_archivo(ruta, bloque=1024 * 1024):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for chunk in iter(lambda: f.read(bloque), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def abrir_manifiesto(ruta=RUTA_MANIFIESTO):
+    carpeta = os.path.dirname(ruta)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+    con = sqlite3.connect(ruta, check_same_thread=False)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS contenidos (
+            sha256  TEXT NOT NULL,
+            etapa   TEXT NOT NULL,
+            archivo TEXT NOT NULL,
+            visto   TEXT NOT NULL,
+            PRIMARY KEY (sha256, etapa)
+        )
+    """)
+    con.commit()
+    return con
+
+
+def etapa_hecha(con, sha256, etapa):
+    with _lock:
+        fila = con.execute(
+            "SELECT 1 FROM contenidos WHERE sha256 = ? AND etapa = ?", (sha256, etapa)
+        ).fetchone()
+    return fila is not None
+
+
+def marcar_etapa(con, sha256, etapa, archivo):
+    with _lock:
+        con.execute(
+            "INSERT OR REPLACE INTO contenidos (sha256, etapa, archivo, visto) VALUES (?, ?, ?, ?)",
+            (sha256, etapa, archivo, datetime.now().isoformat(timespec="seconds")),
+        )
+        con.commit()
+
+
+def filtrar_pendientes(con, rutas, etapa):
+    """
+    Devuelve [(ruta, sha256)] de los archivos cuyo contenido la etapa todavía
+    no vio. Los repetidos dentro de la misma tanda se cuentan una sola vez.
+    """
+    pendientes, vistos = [], set()
+    for ruta in rutas:
+        sha = hash_archivo(ruta)
+        if sha in vistos or etapa_hecha(con, sha, etapa):
+            print(f"⏭️ Sin cambios ({etapa}): {os.path.basename(ruta)}", flush=True)
+            continue
+        vistos.add(sha)
+        pendientes.append((ruta, sha))
+    return pendientes
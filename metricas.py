@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Tiempos y contadores de cada etapa de la corrida.
+
+    with medir("db.escribir"):
+        ...
+    contar("drive.subidos")
+
+Al final de cada script se llama a guardar_reporte(), que escribe un JSON por
+corrida en estado/metricas/, lo compara con la corrida anterior del mismo
+script (avisando regresiones; quedan las últimas METRICAS_CONSERVAR) y, si METRICAS_PROMETHEUS apunta a un archivo,
+deja ahí las mismas métricas en formato de texto de Prometheus.
+"""
+import glob
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from estado_json import guardar_json, leer_json
+
+CARPETA_METRICAS = os.getenv("METRICAS_DIR", os.path.join("estado", "metricas"))
+# Reportes por corrida que se guardan de cada script (ultimo-<script>.json aparte)
+CONSERVAR = int(os.getenv("METRICAS_CONSERVAR", "30"))
+
+# Una etapa se marca como regresión si su media empeora más de esto (y al menos MINIMO_REGRESION s)
+FACTOR_REGRESION = 1.5
+MINIMO_REGRESION = 0.2
+
+_lock = threading.Lock()
+_tiempos = {}
+_contadores = {}
+_inicio = time.time()
+
+
+@contextmanager
+def medir(etapa):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - t0
+        with _lock:
+            _tiempos.setdefault(etapa, []).append(duracion)
+
+
+def contar(nombre, n=1):
+    with _lock:
+        _contadores[nombre] = _contadores.get(nombre, 0) + n
+
+
+def extraer():
+    """
+    Devuelve los tiempos y contadores crudos acumulados hasta ahora y los vacía.
+    Lo usan los procesos de un pool para mandarle sus métricas al proceso padre.
+    """
+    global _tiempos, _contadores
+    with _lock:
+        crudo = {"tiempos": _tiempos, "contadores": _contadores}
+        _tiempos, _contadores = {}, {}
+    return crudo
+
+
+def incorporar(crudo):
+    """Suma a las métricas de este proceso las que devolvió extraer() en otro."""
+    with _lock:
+        for etapa, duraciones in crudo["tiempos"].items():
+            _tiempos.setdefault(etapa, []).extend(duraciones)
+        for nombre, n in crudo["contadores"].items():
+            _contadores[nombre] = _contadores.get(nombre, 0) + n
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+def resumen():
+    with _lock:
+        tiempos = {k: list(v) for k, v in _tiempos.items()}
+        contadores = dict(_contadores)
+    etapas = {
+        etapa: {
+            "n": len(v),
+            "total_s": round(sum(v), 4),
+            "media_s": round(sum(v) / len(v), 4),
+            "p50_s": round(_percentil(v, 0.5), 4),
+            "p95_s": round(_percentil(v, 0.95), 4),
+            "max_s": round(max(v), 4),
+        }
+        for etapa, v in sorted(tiempos.items())
+    }
+    return {"etapas": etapas, "contadores": dict(sorted(contadores.items()))}
+
+
+def comparar(actual, previo):
+    """Etapas cuya media empeoró respecto de la corrida anterior."""
+    regresiones = []
+    for etapa, datos in actual["etapas"].items():
+        antes = previo.get("etapas", {}).get(etapa)
+        if not antes:
+            continue
+        if (datos["media_s"] > antes["media_s"] * FACTOR_REGRESION
+                and datos["media_s"] - antes["media_s"] > MINIMO_REGRESION):
+            regresiones.append({"etapa": etapa, "antes_s": antes["media_s"], "ahora_s": datos["media_s"]})
+    return regresiones
+
+
+def texto_prometheus(reporte):
+    lineas = [
+        "# HELP enargas_etapa_segundos Duración de cada etapa de la corrida",
+        "# TYPE enargas_etapa_segundos summary",
+    ]
+    for etapa, d in reporte["etapas"].items():
+        etiqueta = f'script="{reporte["script"]}",etapa="{etapa}"'
+        lineas.append(f'enargas_etapa_segundos{{{etiqueta},quantile="0.5"}} {d["p50_s"]}')
+        lineas.append(f'enargas_etapa_segundos{{{etiqueta},quantile="0.95"}} {d["p95_s"]}')
+        lineas.append(f"enargas_etapa_segundos_sum{{{etiqueta}}} {d['total_s']}")
+        lineas.append(f"enargas_etapa_segundos_count{{{etiqueta}}} {d['n']}")
+    lineas += ["# HELP enargas_eventos_total Contadores de la corrida", "# TYPE enargas_eventos_total counter"]
+    for nombre, n in reporte["contadores"].items():
+        lineas.append(f'enargas_eventos_total{{script="{reporte["script"]}",nombre="{nombre}"}} {n}')
+    lineas.append(f'enargas_corrida_segundos{{script="{reporte["script"]}"}} {reporte["duracion_s"]}')
+    return "\n".join(lineas) + "\n"
+
+
+def podar_reportes(script, carpeta=CARPETA_METRICAS, conservar=CONSERVAR):
+    """Borra los reportes más viejos de 'script' y deja los últimos 'conservar'."""
+    # El nombre lleva la fecha y hora, así que el orden alfabético es el cronológico
+    reportes = sorted(glob.glob(os.path.join(carpeta, f"{script}-[0-9]*.json")))
+    for ruta in reportes[:max(len(reportes) - conservar, 0)]:
+        os.remove(ruta)
+
+
+def guardar_reporte(script, carpeta=CARPETA_METRICAS, prometheus=None):
+    """Escribe el reporte JSON de la corrida y devuelve el dict."""
+    os.makedirs(carpeta, exist_ok=True)
+    reporte = {
+        "script": script,
+        "inicio": datetime.fromtimestamp(_inicio).isoformat(timespec="seconds"),
+        "duracion_s": round(time.time() - _inicio, 3),
+        **resumen(),
+    }
+
+    ultimo = os.path.join(carpeta, f"ultimo-{script}.json")
+    reporte["regresiones"] = comparar(reporte, leer_json(ultimo))
+
+    ruta = os.path.join(carpeta, f"{script}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    for destino in (ruta, ultimo):
+        guardar_json(destino, reporte, ordenar=False)
+    podar_reportes(script, carpeta)
+
+    print(f"⏱️ Corrida {script}: {reporte['duracion_s']}s", flush=True)
+    for etapa, d in sorted(reporte["etapas"].items(), key=lambda kv: -kv[1]["total_s"]):
+        print(f"   {etapa:<28} n={d['n']:<4} total={d['total_s']:.2f}s  p95={d['p95_s']:.2f}s", flush=True)
+    for r in reporte["regresiones"]:
+        print(f"🐢 Regresión en {r['etapa']}: {r['antes_s']}s -> {r['ahora_s']}s", flush=True)
+
+    prometheus = prometheus or os.getenv("METRICAS_PROMETHEUS")
+    if prometheus:
+        with open(prometheus, "w", encoding="utf-8") as f:
+            f.write(texto_prometheus(reporte))
+    return reporte
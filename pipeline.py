@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Corrida completa en un solo proceso: scraping -> Drive -> DB.
+
+Cada descarga terminada se pasa por colas en memoria a la subida a Drive y
+a la carga en la DB, que trabajan en paralelo con las descargas que siguen.
+No se vuelve a listar descargas_enargas ni se levanta un intérprete por etapa.
+"""
+import argparse
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from huellas import cargar_huellas, clave, guardar_huellas
+from manifiesto import abrir_manifiesto, filtrar_pendientes, ETAPA_DRIVE
+from metricas import guardar_reporte
+from procesar_a_db import MODOS_ESCRITURA, cargar_archivos
+from scraper_enargas import PERIODO, descargar_estadisticas
+import upload_to_drive
+
+FIN = None
+
+
+def etapa_drive(cola, errores, workers=4):
+    """Consume rutas de la cola y las sube a Drive con un pool de hilos."""
+    # Si ningún cuadro tiene novedades no hace falta ni autenticarse
+    primera = cola.get()
+    if primera is FIN:
+        return
+    drive = upload_to_drive.autenticar()
+    manifiesto = abrir_manifiesto()
+
+    def subir(ruta):
+        try:
+            for ruta_pendiente, sha in filtrar_pendientes(manifiesto, [ruta], ETAPA_DRIVE):
+                def en_carpeta(folder_id, ruta_pendiente=ruta_pendiente, sha=sha):
+                    # Las rutas llegan de a una: se consulta solo ese título, no la carpeta entera
+                    remotos = upload_to_drive.listar_remotos(drive, folder_id, [os.path.basename(ruta_pendiente)])
+                    upload_to_drive.subir_si_cambio(drive, ruta_pendiente, folder_id, remotos, manifiesto, sha)
+
+                # Con el ID de la carpeta cacheado, un 404 lo vuelve a resolver (como upload_to_drive.main)
+                upload_to_drive.con_carpeta(drive, en_carpeta)
+        except Exception as e:
+            print(f"❌ Error subiendo {os.path.basename(ruta)}: {e!r}", flush=True)
+            errores.append(("drive", ruta))
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            pool.submit(subir, primera)
+            while (ruta := cola.get()) is not FIN:
+                pool.submit(subir, ruta)
+    finally:
+        manifiesto.close()
+
+
+def etapa_db(cola, errores, modo_escritura="lote"):
+    """Consume rutas de la cola y carga cada archivo en su propia transacción."""
+    while (ruta := cola.get()) is not FIN:
+        try:
+            cargar_archivos([ruta], modo_escritura=modo_escritura)
+        except Exception as e:
+            print(f"❌ Error cargando {os.path.basename(ruta)}: {e!r}", flush=True)
+            errores.append(("db", ruta))
+
+
+def _consumidor(nombre, objetivo, cola, errores, *args):
+    """Si una etapa no puede ni arrancar (credenciales, DB caída) se vacía su cola igual."""
+    try:
+        objetivo(cola, errores, *args)
+    except Exception as e:
+        print(f"❌ La etapa {nombre} falló: {e!r}", flush=True)
+        errores.append((nombre, None))
+        while cola.get() is not FIN:
+            pass
+
+
+def ejecutar_pipeline(workers=3, motor="auto", workers_drive=4, modo_escritura="lote",
+                      subir=True, cargar=True, solo_cambios=False):
+    """
+    Corre las tres etapas y devuelve la lista de errores [(etapa, ruta o cuadro)].
+    Con solo_cambios, los cuadros sin novedades respecto de la última corrida
+    no pasan a Drive ni a la DB.
+    """
+    errores = []
+    huellas = cargar_huellas() if solo_cambios else None
+    previas = dict(huellas or {})
+    colas, hilos = [], []
+    if subir:
+        cola = queue.Queue()
+        colas.append(cola)
+        hilos.append(threading.Thread(target=_consumidor, name="drive",
+                                      args=("drive", etapa_drive, cola, errores, workers_drive)))
+    if cargar:
+        cola = queue.Queue()
+        colas.append(cola)
+        hilos.append(threading.Thread(target=_consumidor, name="db",
+                                      args=("db", etapa_db, cola, errores, modo_escritura)))
+    for hilo in hilos:
+        hilo.start()
+
+    def al_descargar(periodo, cuadro, ruta):
+        for cola in colas:
+            cola.put(ruta)
+
+    try:
+        resultados = descargar_estadisticas(workers=workers, motor=motor, al_descargar=al_descargar,
+                                            huellas=huellas)
+    finally:
+        for cola in colas:
+            cola.put(FIN)
+        for hilo in hilos:
+            hilo.join()
+
+    fallidos = [c for c, ruta in resultados.items() if ruta is None]
+    for cuadro in fallidos:
+        errores.append(("descarga", cuadro))
+
+    if huellas is not None:
+        # Lo que falló en Drive o en la DB se tiene que volver a intentar mañana aunque no cambie
+        etapa_caida = any(ruta is None for _, ruta in errores)
+        con_error = {ruta for _, ruta in errores}
+        for cuadro, ruta in resultados.items():
+            if ruta is not None and (etapa_caida or ruta in con_error):
+                k = clave(PERIODO, cuadro)
+                if k in previas:
+                    huellas[k] = previas[k]
+                else:
+                    huellas.pop(k, None)
+        guardar_huellas(huellas)
+
+    print(f"✔️ Pipeline terminado: {len(resultados) - len(fallidos)} descargas, {len(errores)} errores", flush=True)
+    return errores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Descarga, sube a Drive y carga en la DB en una sola corrida")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("ENARGAS_WORKERS", "3")),
+                        help="navegadores en paralelo para las descargas")
+    parser.add_argument("--motor", choices=("auto", "http", "selenium"),
+                        default=os.getenv("ENARGAS_MOTOR", "auto"))
+    parser.add_argument("--workers-drive", type=int, default=int(os.getenv("GDRIVE_WORKERS", "4")))
+    parser.add_argument("--modo-escritura", choices=MODOS_ESCRITURA, default="lote")
+    parser.add_argument("--sin-drive", action="store_true", help="no subir a Google Drive")
+    parser.add_argument("--sin-db", action="store_true", help="no cargar en la DB")
+    parser.add_argument("--solo-cambios", action="store_true",
+                        help="no subir ni cargar los cuadros iguales a los de la última corrida")
+    args = parser.parse_args()
+    try:
+        errores = ejecutar_pipeline(workers=args.workers, motor=args.motor, workers_drive=args.workers_drive,
+                                    modo_escritura=args.modo_escritura,
+                                    subir=not args.sin_drive, cargar=not args.sin_db,
+                                    solo_cambios=args.solo_cambios)
+    finally:
+        guardar_reporte("pipeline")
+    if errores:
+        raise SystemExit(1)
@@ -3,36 +3,35 @@
 # coment para activarlo x1
 # coment para activarlo x2
 import os
+import io
 import re
+import argparse
 import pandas as pd
-import psycopg2
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from psycopg2.extras import execute_values
 from datetime import datetime, timedelta
-from urllib.parse import urlparse
-
-def es_html_camuflado(path):
-    with open(path, "rb") as f:
-        inicio = f.read(1024).lower()
-    return any(tag in inicio for tag in (b'<html', b'<table', b'<!doctype html'))
-
-def conectar_db():
-    url = os.getenv("SUPABASE_URL")
-    pwd = os.getenv("SUPABASE_KEY")
-    
-    print(f">>> conectar_db(): URL={url}  USER={urlparse(url).username}", flush=True)
-
-    if not url or not pwd:
-        raise RuntimeError("Falta SUPABASE_URL o SUPABASE_KEY")
-        
-    parsed = urlparse(url)
-    return psycopg2.connect(
-        host     = parsed.hostname,
-        port     = parsed.port,
-        dbname   = parsed.path.lstrip("/"),
-        user     = parsed.username,
-        password = pwd,
-        sslmode  = "require",
-        connect_timeout = 20
-    )
+from archivo_parquet import PATRON_ARCHIVO, archivo_activo, tabla_archivada
+# conectar_db se re-exporta: scripts viejos lo importaban de acá
+from conexion_db import conectar_db, ejecutar_transaccion, obtener_pool  # noqa: F401
+# es_html_camuflado se re-exporta: antes estaba definida en este archivo
+from lector_enargas import es_html_camuflado, leer_tabla, leer_ultima_fila, podar  # noqa: F401
+from manifiesto import abrir_manifiesto, filtrar_pendientes, hash_archivo, marcar_etapa, ETAPA_DB, ETAPA_DB_HISTORICO
+from metricas import contar, extraer, guardar_reporte, incorporar, medir
+from resumenes import PROVINCIA_TOTAL, actualizar_resumenes, reconstruir_resumenes, resumenes_disponibles
+
+# Columnas de ENARGAS que no coinciden con el nombre del catálogo de provincias
+ALIAS_PROVINCIAS = {
+    "Capital Federal": "Ciudad Autónoma de Buenos Aires",
+    "Sgo. del Estero": "Santiago del Estero",
+    "T. del Fuego": "Tierra del Fuego",
+}
+
+MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
+    "julio": 7, "agosto": 8, "septiembre": 9, "setiembre": 9,
+    "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
 
 def cargar_catalogos(cur):
     cur.execute("SELECT id, nombre FROM practicas")
@@ -41,20 +40,330 @@ def cargar_catalogos(cur):
     provincias = {nombre: pid for pid, nombre in cur.fetchall()}
     return practicas, provincias
 
-def procesar():
-    carpeta = "descargas_enargas"
-    conn = conectar_db()
-    print("✅ Conectado a la DB OK", flush=True)
-    cur  = conn.cursor()
-    practicas, provincias = cargar_catalogos(cur)
+def cargar_acumulados_previos(cur, claves):
+    """
+    Trae en una sola consulta el último (fecha, acumulado) anterior a cada
+    fecha pedida, para todas las provincias de cada práctica.
+    claves: iterable de (practica_id, fecha_datos).
+    Devuelve {(practica_id, fecha_datos): {provincia_id: (fecha, acumulado)}}.
+    """
+    claves = sorted(set(claves))
+    previos = {clave: {} for clave in claves}
+    if not claves:
+        return previos
+
+    with medir("db.prefetch"):
+        filas = execute_values(cur, """
+            SELECT k.practica_id, k.fecha, e.provincia_id, e.fecha, e.acumulado
+            FROM (VALUES %s) AS k(practica_id, fecha)
+            CROSS JOIN LATERAL (
+                SELECT DISTINCT ON (provincia_id) provincia_id, fecha, acumulado
+                FROM estadisticas_diarias
+                WHERE practica_id = k.practica_id AND fecha < k.fecha
+                ORDER BY provincia_id, fecha DESC
+            ) e
+        """, claves, template="(%s::integer, %s::date)", fetch=True)
+
+    for practica_id, fecha_datos, provincia_id, fecha, acumulado in filas:
+        previos[(practica_id, fecha_datos)][provincia_id] = (fecha, acumulado)
+    return previos
+
+def cargar_marcas(cur, practica_ids):
+    """Última fecha cargada de cada práctica, en una sola consulta: {practica_id: fecha}."""
+    if not practica_ids:
+        return {}
+    cur.execute("""
+        SELECT practica_id, MAX(fecha)
+        FROM estadisticas_diarias
+        WHERE practica_id = ANY(%s)
+        GROUP BY practica_id
+    """, (sorted(set(practica_ids)),))
+    return dict(cur.fetchall())
+
+def filtrar_por_marca(archivos, marcas):
+    """Descarta los archivos cuya fecha_datos no es posterior a la marca de su práctica."""
+    nuevos = [a for a in archivos if marcas.get(a[2]) is None or a[0] > marcas[a[2]]]
+    salteados = len(archivos) - len(nuevos)
+    if salteados:
+        print(f"⏭️ {salteados} archivos con fecha ya cargada (usar --forzar para reprocesarlos)", flush=True)
+    return nuevos
+
+MODOS_ESCRITURA = ("fila", "lote", "copy")
+
+# Primera clave de pg_advisory_xact_lock(clave, practica_id) al escribir estadisticas_diarias
+LOCK_ESTADISTICAS = 0x454E4152  # "ENAR"
+
+# Si la fila ya tiene esos valores no se reescribe (ni WAL ni tupla muerta): el WHERE
+# la deja como está y no aparece en el RETURNING. xmax = 0 solo en las recién insertadas.
+CONFLICTO_ESTADISTICAS = """
+    ON CONFLICT(practica_id, provincia_id, fecha)
+    DO UPDATE SET acumulado = EXCLUDED.acumulado, diaria = EXCLUDED.diaria
+    WHERE (estadisticas_diarias.acumulado, estadisticas_diarias.diaria)
+          IS DISTINCT FROM (EXCLUDED.acumulado, EXCLUDED.diaria)
+    RETURNING (estadisticas_diarias.xmax = 0) AS insertada
+"""
+
+UPSERT_ESTADISTICAS = """
+    INSERT INTO estadisticas_diarias
+      (practica_id, provincia_id, fecha, acumulado, diaria)
+    VALUES %s
+""" + CONFLICTO_ESTADISTICAS
+
+def filas_unicas(filas):
+    """Un mismo INSERT no puede tocar dos veces la misma fila: gana la última."""
+    unicas = {}
+    for fila in filas:
+        unicas[fila[:3]] = fila
+    return list(unicas.values())
+
+def escribir_estadisticas(cur, filas, modo="lote"):
+    """
+    Escribe las filas (practica_id, provincia_id, fecha, acumulado, diaria),
+    salvo las que ya están en la DB con los mismos valores.
+    - fila:  un INSERT ... ON CONFLICT por fila (comportamiento original)
+    - lote:  un solo INSERT multi-VALUES con execute_values
+    - copy:  COPY a una tabla temporal y un único INSERT ... SELECT ... ON CONFLICT
+    Devuelve (insertadas, actualizadas, sin_cambios).
+    """
+    filas = filas_unicas(filas)
+    if not filas:
+        return 0, 0, 0
+
+    if modo == "fila":
+        escritas = []
+        for fila in filas:
+            cur.execute(UPSERT_ESTADISTICAS % "(%s, %s, %s, %s, %s)", fila)
+            escritas += cur.fetchall()
+
+    elif modo == "lote":
+        escritas = execute_values(cur, UPSERT_ESTADISTICAS, filas, page_size=len(filas), fetch=True)
+
+    elif modo == "copy":
+        cur.execute("""
+            DROP TABLE IF EXISTS staging_estadisticas;
+            CREATE TEMP TABLE staging_estadisticas (
+                practica_id  integer,
+                provincia_id integer,
+                fecha        date,
+                acumulado    bigint,
+                diaria       bigint
+            ) ON COMMIT DROP
+        """)
+        buffer = io.StringIO()
+        for fila in filas:
+            buffer.write("\t".join(str(v) for v in fila) + "\n")
+        buffer.seek(0)
+        cur.copy_expert("COPY staging_estadisticas FROM STDIN", buffer)
+        cur.execute("""
+            INSERT INTO estadisticas_diarias
+              (practica_id, provincia_id, fecha, acumulado, diaria)
+            SELECT practica_id, provincia_id, fecha, acumulado, diaria
+            FROM staging_estadisticas
+        """ + CONFLICTO_ESTADISTICAS)
+        escritas = cur.fetchall()
+
+    else:
+        raise ValueError(f"Modo de escritura desconocido: {modo}")
+
+    insertadas = sum(1 for (insertada,) in escritas if insertada)
+    actualizadas = len(escritas) - insertadas
+    return insertadas, actualizadas, len(filas) - len(escritas)
+
+def a_registros(datos, provincias):
+    """
+    Pasa las columnas de ENARGAS a provincia_id del catálogo (vía ALIAS_PROVINCIAS)
+    y deja el acumulado como entero. Avisa una sola vez por las no mapeadas.
+    """
+    nombres = datos["columna"].replace(ALIAS_PROVINCIAS)
+    datos = datos.assign(provincia_id=nombres.map(provincias))
+    no_mapeadas = sorted(nombres[datos["provincia_id"].isna()].unique())
+    if no_mapeadas:
+        print(f"⚠ Provincias no mapeadas: {', '.join(map(str, no_mapeadas))}")
+    datos = datos.dropna(subset=["provincia_id"])
+    return datos.assign(
+        provincia_id=datos["provincia_id"].astype("int64"),
+        acumulado=pd.to_numeric(datos["acumulado"], errors="coerce").fillna(0).astype("int64"),
+        fecha=pd.to_datetime(datos["fecha"]),
+    )
+
+def calcular_diarias(cur, datos):
+    """
+    Calcula la diaria de todos los registros (practica_id, provincia_id, fecha,
+    acumulado) de una tanda de archivos a la vez.
+    El valor anterior de cada registro es el más reciente entre el registro
+    previo de la misma tanda y lo que ya hay en la DB (una sola consulta).
+    Si el anterior es de otro mes, la diaria es el acumulado entero.
+    """
+    claves = ["practica_id", "provincia_id", "fecha"]
+    # Si la misma fecha viene en varios archivos, gana la última descarga
+    datos = datos.drop_duplicates(claves, keep="last").sort_values(claves, ignore_index=True)
+
+    por_provincia = datos.groupby(["practica_id", "provincia_id"])
+    datos["fecha_previa"] = por_provincia["fecha"].shift()
+    datos["acumulado_previo"] = por_provincia["acumulado"].shift()
+
+    previos = cargar_acumulados_previos(cur, {
+        (int(p), f.date()) for p, f in datos[["practica_id", "fecha"]].drop_duplicates().itertuples(index=False)
+    })
+    en_db = pd.DataFrame(
+        [(p, f, prov, fa, a) for (p, f), por_prov in previos.items() for prov, (fa, a) in por_prov.items()],
+        columns=["practica_id", "fecha", "provincia_id", "fecha_db", "acumulado_db"],
+    ).astype({"practica_id": "int64", "provincia_id": "int64", "acumulado_db": "float64"})
+    en_db["fecha"] = pd.to_datetime(en_db["fecha"]).astype(datos["fecha"].dtype)
+    en_db["fecha_db"] = pd.to_datetime(en_db["fecha_db"]).astype(datos["fecha"].dtype)
+    datos = datos.merge(en_db, on=claves, how="left")
+
+    # Lo de la DB solo gana si es posterior a lo cargado antes en esta tanda
+    usar_db = datos["fecha_db"].notna() & ~(datos["fecha_previa"] >= datos["fecha_db"])
+    datos["fecha_previa"] = datos["fecha_previa"].where(~usar_db, datos["fecha_db"])
+    datos["acumulado_previo"] = datos["acumulado_previo"].where(~usar_db, datos["acumulado_db"])
+
+    mismo_mes = datos["fecha_previa"].dt.to_period("M") == datos["fecha"].dt.to_period("M")
+    base = datos["acumulado_previo"].where(mismo_mes, 0).fillna(0)
+    datos["diaria"] = (datos["acumulado"] - base).astype("int64")
+    return datos[claves + ["acumulado", "diaria"]]
+
+def agregar_total(datos):
+    """Agrega el TOTAL (provincia 25) = suma de las provincias 1 a 24 por práctica y fecha."""
+    total = (datos[datos["provincia_id"] <= 24]
+             .groupby(["practica_id", "fecha"], as_index=False)[["acumulado", "diaria"]].sum())
+    total["provincia_id"] = PROVINCIA_TOTAL
+    return pd.concat([datos, total[datos.columns]], ignore_index=True)
 
-    pattern = re.compile(r"^([a-z\-]+)-(\d{8})-\d{6}\.xls$", re.IGNORECASE)
+def a_filas(datos):
+    return [
+        (int(p), int(prov), f.date(), int(a), int(d))
+        for p, prov, f, a, d in datos[["practica_id", "provincia_id", "fecha", "acumulado", "diaria"]]
+            .itertuples(index=False)
+    ]
 
-    for archivo in os.listdir(carpeta):
-        print(f">>> Procesando archivo: {archivo}", flush=True)
+def interpretar_mes(valor, anio):
+    """
+    Valor de la columna "Mes" -> primer día del mes (pd.Timestamp), o NaT si
+    la fila no es un mes (por ejemplo una fila de totales).
+    Acepta nombres en castellano ("Enero", "Enero 2024"), "MM/AAAA" y fechas.
+    """
+    if isinstance(valor, (datetime, pd.Timestamp)):
+        return pd.Timestamp(valor.year, valor.month, 1)
+    texto = str(valor).strip().lower()
+    m = re.match(r"^(\d{1,2})[/-](\d{4})$", texto)
+    if m:
+        return pd.Timestamp(int(m.group(2)), int(m.group(1)), 1)
+    m = re.match(r"^(\d{4})[/-](\d{1,2})", texto)
+    if m:
+        return pd.Timestamp(int(m.group(1)), int(m.group(2)), 1)
+    partes = re.split(r"[\s/-]+", texto)
+    if partes and partes[0] in MESES:
+        anios = [int(p) for p in partes[1:] if re.fullmatch(r"\d{4}", p)]
+        return pd.Timestamp(anios[0] if anios else anio, MESES[partes[0]], 1)
+    return pd.NaT
+
+def columnas_catalogo(provincias):
+    """Columnas de ENARGAS que hace falta leer: Mes y las provincias del catálogo (con sus alias)."""
+    nombres = {nombre for nombre, pid in provincias.items() if pid != PROVINCIA_TOTAL}
+    nombres |= {origen for origen, destino in ALIAS_PROVINCIAS.items() if destino in nombres}
+    return frozenset(nombres | {"Mes"})
+
+def registros_archivo(trabajo):
+    """
+    Etapa de CPU (corre en los procesos del pool): lee un .xls y devuelve
+    (registros compactos [(practica_id, fecha, {columna: acumulado})], columnas descartadas).
+    trabajo: (fecha_datos, ruta, practica_id, sha256, historico, periodo, columnas).
+    - diario: solo la última fila (mes en curso), como acumulado de fecha_datos
+    - histórico: cada fila de mes, a fin de mes (el mes en curso queda en fecha_datos)
+    """
+    fecha_datos, ruta, practica_id, sha, historico, periodo, columnas = trabajo
+    # Cada contenido se parsea una sola vez (entero): después se lee del archivo Parquet
+    if sha and archivo_activo():
+        tabla = podar(tabla_archivada(ruta, sha, leer_tabla, periodo), columnas)
+    else:
+        tabla = None
+    limite = pd.Timestamp(fecha_datos)
+
+    if not historico:
+        ultima = tabla.iloc[-1] if tabla is not None else leer_ultima_fila(ruta, columnas)
+        descartadas = tabla.attrs["descartadas"] if tabla is not None else ultima.attrs.get("descartadas", [])
+        return [(practica_id, limite, ultima.drop(["Mes", "Total"], errors="ignore").to_dict())], descartadas
+
+    df = tabla if tabla is not None else leer_tabla(ruta, columnas)
+    descartadas = df.attrs.get("descartadas", [])
+    anio = int(periodo) if periodo else (fecha_datos + timedelta(days=1)).year
+    meses = df["Mes"].map(lambda v: interpretar_mes(v, anio))
+    df = df[meses.notna()].drop(columns=["Mes", "Total"], errors="ignore")
+
+    registros = []
+    for mes, valores in zip(meses.dropna(), df.to_dict("records")):
+        if mes > limite:
+            continue
+        registros.append((practica_id, min(mes + pd.offsets.MonthEnd(0), limite), valores))
+    return registros, descartadas
+
+def intentar_archivo(trabajo):
+    """registros_archivo sin cortar la tanda: (resultado, None) o (None, error) si el archivo no se pudo leer."""
+    try:
+        return registros_archivo(trabajo), None
+    except Exception as e:
+        return None, repr(e)
+
+def registros_archivo_con_metricas(trabajo):
+    """intentar_archivo en un proceso del pool, devolviendo también sus métricas (tiempos de parseo, Parquet)."""
+    # Con fork, el hijo arranca con una copia de las métricas del padre: no hay que devolverlas
+    extraer()
+    return intentar_archivo(trabajo), extraer()
+
+def parsear_archivos(trabajos, procesos=1):
+    """
+    Parsea los archivos repartidos en 'procesos' procesos (1 = en este mismo)
+    y junta los registros en el orden de 'trabajos'.
+    Un archivo que no se puede leer no frena a los demás: se avisa y se
+    devuelve en la lista de fallidos. Devuelve (registros, rutas fallidas).
+    """
+    procesos = max(1, min(procesos, len(trabajos)))
+    if procesos > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            por_archivo = []
+            for resultado, metricas in pool.map(registros_archivo_con_metricas, trabajos,
+                                                chunksize=max(1, len(trabajos) // (procesos * 4))):
+                incorporar(metricas)
+                por_archivo.append(resultado)
+    else:
+        por_archivo = [intentar_archivo(t) for t in trabajos]
+
+    registros, descartadas, fallidos = [], set(), []
+    for trabajo, (resultado, error) in zip(trabajos, por_archivo):
+        modo = " (histórico)" if trabajo[4] else ""
+        print(f">>> Procesando archivo{modo}: {os.path.basename(trabajo[1])}", flush=True)
+        if error:
+            print(f"❌ No se pudo leer {os.path.basename(trabajo[1])}: {error}", flush=True)
+            fallidos.append(trabajo[1])
+            continue
+        registros_de_archivo, descartadas_de_archivo = resultado
+        registros += registros_de_archivo
+        descartadas.update(descartadas_de_archivo)
+    descartadas -= {"Total"}
+    if descartadas:
+        print(f"⚠ Provincias no mapeadas: {', '.join(sorted(map(str, descartadas)))}")
+    return registros, fallidos
+
+def filas_desde_registros(cur, registros, provincias):
+    """Etapa de DB: registros compactos -> filas (con diaria y TOTAL) listas para escribir."""
+    if not registros:
+        return []
+    largo = pd.DataFrame(
+        [(p, f, columna, v) for p, f, valores in registros for columna, v in valores.items()],
+        columns=["practica_id", "fecha", "columna", "acumulado"],
+    )
+    datos = agregar_total(calcular_diarias(cur, a_registros(largo, provincias)))
+    return a_filas(datos)
+
+def interpretar_archivos(rutas, practicas):
+    """[(fecha_datos, ruta, practica_id)] de los .xls con nombre válido, ordenados por fecha."""
+    archivos = []
+    for ruta in rutas:
+        archivo = os.path.basename(ruta)
         if not archivo.lower().endswith(".xls"):
             continue
-        m = pattern.match(archivo)
+        m = PATRON_ARCHIVO.match(archivo)
         if not m:
             continue
 
@@ -66,86 +375,189 @@ def procesar():
 
         fecha_desc = datetime.strptime(fecha_str, "%Y%m%d").date()
         fecha_datos = fecha_desc - timedelta(days=1)
+        archivos.append((fecha_datos, ruta, practica_id))
+
+    # Ordenados por fecha, así cada archivo ve como "anterior" lo que cargaron los previos
+    archivos.sort()
+    return archivos
+
+def bloquear_practica(cur, practica_id):
+    """
+    Lock de la práctica hasta el fin de la transacción: otro loader (otra
+    corrida, el pipeline) que cargue la misma práctica espera, así las
+    diarias y los resúmenes se calculan sobre lo que el otro ya escribió.
+    """
+    cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", (LOCK_ESTADISTICAS, practica_id))
 
-        ruta = os.path.join(carpeta, archivo)
-        if es_html_camuflado(ruta):
-            tablas = pd.read_html(ruta, header=0)
-            df = tablas[1]
+def cargar_practica(nombre, registros, provincias, modo_escritura, historico):
+    """
+    Una transacción por práctica: lock, diarias, resúmenes y escritura.
+    Devuelve (insertadas, actualizadas, sin_cambios).
+    """
+    def escribir(cur):
+        practica_id = registros[0][0]
+        with medir("db.lock"):
+            bloquear_practica(cur, practica_id)
+        filas = filas_desde_registros(cur, registros, provincias)
+        modo = "Histórico" if historico else "Calculados"
+        print(f"✅ {nombre} - {modo}: {len(filas)} registros (con TOTAL)", flush=True)
+
+        # Los resúmenes leen la diaria anterior, así que van antes de pisarla
+        filas = filas_unicas(filas)
+        if filas and resumenes_disponibles(cur):
+            with medir("db.resumenes"):
+                actualizar_resumenes(cur, filas)
+
+        with medir(f"db.escribir.{modo_escritura}"):
+            conteo = escribir_estadisticas(cur, filas, modo_escritura)
+        print(f"✅ {nombre}: {conteo[0]} nuevas, {conteo[1]} actualizadas, {conteo[2]} sin cambios "
+              f"(modo {modo_escritura}). Commit", flush=True)
+        return conteo
+
+    # Si la conexión se cae o hay un conflicto de serialización, se repite solo esta práctica
+    return ejecutar_transaccion(escribir)
+
+def cargar_archivos(rutas, modo_escritura="lote", forzar=False, historico=False, periodo=None, procesos=1,
+                    cargadores=1):
+    """
+    Carga en la DB los .xls indicados. Devuelve los que se cargaron.
+    El parseo corre en 'procesos' procesos sin tener tomada una conexión;
+    después cada práctica se escribe en su propia transacción, con hasta
+    'cargadores' prácticas a la vez en conexiones distintas. Si una práctica
+    falla, las demás quedan cargadas (y marcadas en el manifiesto) y la
+    próxima corrida solo repite la que falló.
+    """
+    manifiesto = abrir_manifiesto()
+    etapa = ETAPA_DB_HISTORICO if historico else ETAPA_DB
+
+    # El pool se crea con la primera transacción, así que se dimensiona antes.
+    # Sin conexiones libres, getconn no espera sino que falla: no se usan más cargadores que conexiones
+    maxconn = obtener_pool(maxconn=cargadores).maxconn
+    if cargadores > maxconn:
+        print(f"⚠️ El pool de conexiones ya existe con {maxconn} conexiones: "
+              f"se usan {maxconn} cargadores en lugar de {cargadores}", flush=True)
+
+    def preparar(cur):
+        print("✅ Conectado a la DB OK", flush=True)
+        with medir("db.catalogos"):
+            practicas, provincias = cargar_catalogos(cur)
+        archivos = interpretar_archivos(rutas, practicas)
+
+        # --- En modo diario, lo que no supera la última fecha cargada ya está en la DB ---
+        if not forzar and not historico:
+            with medir("db.marcas"):
+                marcas = cargar_marcas(cur, [practica_id for _, _, practica_id in archivos])
+            archivos = filtrar_por_marca(archivos, marcas)
+        return practicas, provincias, archivos
+
+    cargados = []
+    try:
+        practicas, provincias, archivos = ejecutar_transaccion(preparar)
+        nombres = {pid: nombre for nombre, pid in practicas.items()}
+        columnas = columnas_catalogo(provincias)
+
+        # --- Saltear contenidos que ya se cargaron en corridas anteriores ---
+        if forzar:
+            hashes = {ruta: hash_archivo(ruta) for _, ruta, _ in archivos}
         else:
-            df = pd.read_excel(ruta, header=0)
+            hashes = dict(filtrar_pendientes(manifiesto, [ruta for _, ruta, _ in archivos], etapa))
+            archivos = [a for a in archivos if a[1] in hashes]
 
-        ultima = df.iloc[-1].drop(["Mes", "Total"], errors="ignore")
+        with medir("parseo.archivos"):
+            registros, ilegibles = parsear_archivos(
+                [(fecha, ruta, practica_id, hashes[ruta], historico, periodo, columnas)
+                 for fecha, ruta, practica_id in archivos],
+                procesos,
+            )
+        # Los que no se pudieron leer no se marcan: la próxima corrida los vuelve a intentar
+        archivos = [a for a in archivos if a[1] not in ilegibles]
+        print(f"✅ {len(registros)} registros de {len(archivos)} archivos", flush=True)
 
-        # --- Inicializar acumuladores por práctica ---
-        acumulado_total = 0
-        diaria_total = 0
+        # Las diarias, el TOTAL y los resúmenes de una práctica no dependen de las otras
+        por_practica = defaultdict(list)
+        for registro in registros:
+            por_practica[registro[0]].append(registro)
+        # Los archivos sin registros (p. ej. un histórico sin meses válidos) igual quedan marcados
+        archivos_por_practica = defaultdict(list)
+        for _, ruta, practica_id in archivos:
+            archivos_por_practica[practica_id].append(ruta)
 
-        for col, val in ultima.items():
-            if col == "Capital Federal":
-                prov = "Ciudad Autónoma de Buenos Aires"
-            elif col == "Sgo. del Estero":
-                prov = "Santiago del Estero"
-            elif col == "T. del Fuego":
-                prov = "Tierra del Fuego"
-            else:
-                prov = col
+        def marcar(practica_id):
+            for ruta in archivos_por_practica.pop(practica_id, []):
+                marcar_etapa(manifiesto, hashes[ruta], etapa, os.path.basename(ruta))
+                cargados.append(ruta)
 
-            provincia_id = provincias.get(prov)
-            if provincia_id is None:
-                print(f"⚠ Provincia no mapeada: {prov}")
-                continue
+        for practica_id in set(archivos_por_practica) - set(por_practica):
+            marcar(practica_id)
 
-            acumulado_actual = int(val) if pd.notna(val) else 0
+        cargadores = max(1, min(cargadores, len(por_practica), maxconn))
+        fallidas, totales = [], [0, 0, 0]
+        with ThreadPoolExecutor(max_workers=cargadores) as ejecutor:
+            futuros = {
+                ejecutor.submit(cargar_practica, nombres[practica_id], regs, provincias, modo_escritura,
+                                historico): practica_id
+                for practica_id, regs in por_practica.items()
+            }
+            for futuro in as_completed(futuros):
+                practica_id = futuros[futuro]
+                try:
+                    conteo = futuro.result()
+                except Exception as e:
+                    print(f"❌ {nombres[practica_id]}: no se cargó ({e!r})", flush=True)
+                    fallidas.append(nombres[practica_id])
+                    continue
+                contar("db.archivos", len(archivos_por_practica[practica_id]))
+                contar("db.filas", sum(conteo))
+                for i, nombre in enumerate(("insertadas", "actualizadas", "sin_cambios")):
+                    contar(f"db.filas.{nombre}", conteo[i])
+                    totales[i] += conteo[i]
+                # El manifiesto (SQLite) se toca solo desde este hilo
+                marcar(practica_id)
 
-            cur.execute("""
-                SELECT fecha, acumulado
-                FROM estadisticas_diarias
-                WHERE practica_id = %s AND provincia_id = %s AND fecha < %s
-                ORDER BY fecha DESC
-                LIMIT 1
-            """, (practica_id, provincia_id, fecha_datos))
-            resultado = cur.fetchone()
-
-            if resultado:
-                fecha_anterior, acumulado_anterior = resultado
-                if fecha_anterior.month == fecha_datos.month and fecha_anterior.year == fecha_datos.year:
-                    diaria = acumulado_actual - acumulado_anterior
-                else:
-                    diaria = acumulado_actual
-            else:
-                diaria = acumulado_actual
-
-            cur.execute("""
-                INSERT INTO estadisticas_diarias
-                  (practica_id, provincia_id, fecha, acumulado, diaria)
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT(practica_id, provincia_id, fecha)
-                DO UPDATE SET acumulado = EXCLUDED.acumulado, diaria = EXCLUDED.diaria
-            """, (practica_id, provincia_id, fecha_datos, acumulado_actual, diaria))
-
-            # === Sumar para TOTAL si es provincia válida (1 a 24) ===
-            if provincia_id <= 24:
-                acumulado_total += acumulado_actual
-                diaria_total += diaria
-
-        # Al finalizar la práctica, insertar TOTAL (provincia 25)
-        provincia_total = 25
-        cur.execute("""
-            INSERT INTO estadisticas_diarias
-              (practica_id, provincia_id, fecha, acumulado, diaria)
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT(practica_id, provincia_id, fecha)
-            DO UPDATE SET acumulado = EXCLUDED.acumulado, diaria = EXCLUDED.diaria
-        """, (practica_id, provincia_total, fecha_datos, acumulado_total, diaria_total))
-        print(f"✅ Insertado TOTAL para práctica {practica_id} fecha {fecha_datos}", flush=True)
-
-        print(f"✅ Insertados datos de {archivo}", flush=True)
-
-    print(">>> Commit y cierre", flush=True)        
-    conn.commit()
-    cur.close()
-    conn.close()
+        if len(por_practica) > 1:
+            print(f"✅ Total: {totales[0]} nuevas, {totales[1]} actualizadas, {totales[2]} sin cambios", flush=True)
+        problemas = []
+        if ilegibles:
+            problemas.append(f"{len(ilegibles)} archivos ilegibles: "
+                             f"{', '.join(os.path.basename(r) for r in ilegibles)}")
+        if fallidas:
+            problemas.append(f"{len(fallidas)} prácticas: {', '.join(sorted(fallidas))}")
+        if problemas:
+            raise RuntimeError(f"Fallaron {'; '.join(problemas)}")
+    finally:
+        manifiesto.close()
+    return cargados
+
+def procesar(carpeta="descargas_enargas", modo_escritura="lote", forzar=False, historico=False, periodo=None,
+             procesos=1, cargadores=1):
+    rutas = [os.path.join(carpeta, archivo) for archivo in os.listdir(carpeta)]
+    cargar_archivos(rutas, modo_escritura, forzar, historico, periodo, procesos, cargadores)
     print(">>> Fin procesar()", flush=True)
 
 if __name__ == "__main__":
-    procesar()
+    parser = argparse.ArgumentParser(description="Carga los .xls de ENARGAS en estadisticas_diarias")
+    parser.add_argument("--modo-escritura", choices=MODOS_ESCRITURA, default="lote",
+                        help="fila: un upsert por fila | lote: un solo INSERT | copy: COPY a staging (backfills)")
+    parser.add_argument("--forzar", action="store_true",
+                        help="reprocesar aunque la fecha ya esté cargada o el contenido figure en el manifiesto")
+    parser.add_argument("--historico", action="store_true",
+                        help="cargar todos los meses de cada tabla (backfill) y no solo la última fila")
+    parser.add_argument("--carpeta", default="descargas_enargas")
+    parser.add_argument("--periodo", help="año de las tablas en modo histórico (por defecto, el de la descarga)")
+    parser.add_argument("--procesos", type=int, default=int(os.getenv("ENARGAS_PROCESOS", os.cpu_count() or 1)),
+                        help="procesos para parsear los .xls (1 = sin pool)")
+    parser.add_argument("--cargadores", type=int, default=int(os.getenv("ENARGAS_CARGADORES", "4")),
+                        help="prácticas que se escriben a la vez, cada una en su conexión y su transacción")
+    parser.add_argument("--reconstruir-resumenes", action="store_true",
+                        help="rearmar de cero estadisticas_mensuales y estadisticas_anuales y salir")
+    args = parser.parse_args()
+    try:
+        if args.reconstruir_resumenes:
+            mensuales, anuales = ejecutar_transaccion(reconstruir_resumenes)
+            print(f"✅ Resúmenes reconstruidos: {mensuales} mensuales, {anuales} anuales", flush=True)
+        else:
+            procesar(carpeta=args.carpeta, modo_escritura=args.modo_escritura, forzar=args.forzar,
+                     historico=args.historico, periodo=args.periodo, procesos=args.procesos,
+                     cargadores=args.cargadores)
+    finally:
+        guardar_reporte("procesar_a_db")
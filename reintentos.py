@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+Reintentos con backoff exponencial y jitter, compartidos por la DB
+(conexion_db) y Drive (upload_to_drive). Cada uno decide qué error es
+transitorio y en qué contador de metricas se cuentan los reintentos.
+"""
+import random
+import time
+
+from metricas import contar
+
+
+def esperar_backoff(intento, base=1.0, tope=30.0):
+    """Backoff exponencial con jitter completo."""
+    time.sleep(random.uniform(0, min(tope, base * 2 ** intento)))
+
+
+def con_reintentos(funcion, descripcion, reintentable, reintentos, contador, tope=30.0):
+    """
+    Ejecuta funcion() y, si falla con un error para el que reintentable(e) es
+    True, la repite hasta 'reintentos' veces en total. El último error se propaga.
+    """
+    for intento in range(reintentos):
+        try:
+            return funcion()
+        except Exception as e:
+            if intento == reintentos - 1 or not reintentable(e):
+                raise
+            print(f"⚠️ {descripcion} falló ({type(e).__name__}: {str(e).strip()}). "
+                  f"Reintento {intento + 1}/{reintentos - 1}", flush=True)
+            contar(contador)
+            esperar_backoff(intento, tope=tope)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Resúmenes precalculados de estadisticas_diarias para los tableros:
+
+- estadisticas_mensuales: práctica x provincia x mes (suma de la diaria)
+- estadisticas_anuales:   práctica x año (suma de la diaria del TOTAL, provincia 25)
+
+El loader los mantiene en la misma transacción en la que escribe las diarias,
+sumando la diferencia entre la diaria nueva y la que ya estaba. Con
+reconstruir_resumenes() se arman de cero a partir de estadisticas_diarias.
+"""
+from collections import defaultdict
+
+from psycopg2.extras import execute_values
+
+PROVINCIA_TOTAL = 25
+
+DDL_RESUMENES = """
+    CREATE TABLE IF NOT EXISTS estadisticas_mensuales (
+        practica_id  integer NOT NULL,
+        provincia_id integer NOT NULL,
+        mes          date    NOT NULL,
+        cantidad     bigint  NOT NULL DEFAULT 0,
+        PRIMARY KEY (practica_id, provincia_id, mes)
+    );
+    CREATE TABLE IF NOT EXISTS estadisticas_anuales (
+        practica_id integer NOT NULL,
+        anio        integer NOT NULL,
+        cantidad    bigint  NOT NULL DEFAULT 0,
+        PRIMARY KEY (practica_id, anio)
+    );
+"""
+
+
+def resumenes_disponibles(cur):
+    """True si las tablas de resumen existen (se crean con --reconstruir-resumenes)."""
+    cur.execute("SELECT to_regclass('estadisticas_mensuales') IS NOT NULL "
+                "AND to_regclass('estadisticas_anuales') IS NOT NULL")
+    return cur.fetchone()[0]
+
+
+def diarias_actuales(cur, claves):
+    """Diaria ya grabada para cada (practica_id, provincia_id, fecha) pedida."""
+    if not claves:
+        return {}
+    filas = execute_values(cur, """
+        SELECT e.practica_id, e.provincia_id, e.fecha, e.diaria
+        FROM (VALUES %s) AS k(practica_id, provincia_id, fecha)
+        JOIN estadisticas_diarias e USING (practica_id, provincia_id, fecha)
+    """, claves, template="(%s::integer, %s::integer, %s::date)", page_size=len(claves), fetch=True)
+    return {(p, prov, f): d or 0 for p, prov, f, d in filas}
+
+
+def actualizar_resumenes(cur, filas):
+    """
+    Suma a los resúmenes la diferencia que van a producir las filas
+    (practica_id, provincia_id, fecha, acumulado, diaria). Se llama antes de
+    escribirlas, dentro de la misma transacción, para leer la diaria anterior.
+    Devuelve la cantidad de celdas de resumen que cambiaron.
+    """
+    if not filas:
+        return 0
+    anteriores = diarias_actuales(cur, [fila[:3] for fila in filas])
+
+    mensual, anual = defaultdict(int), defaultdict(int)
+    for practica_id, provincia_id, fecha, _, diaria in filas:
+        delta = (diaria or 0) - anteriores.get((practica_id, provincia_id, fecha), 0)
+        if not delta:
+            continue
+        mensual[(practica_id, provincia_id, fecha.replace(day=1))] += delta
+        if provincia_id == PROVINCIA_TOTAL:
+            anual[(practica_id, fecha.year)] += delta
+
+    mensual = [(*k, v) for k, v in mensual.items() if v]
+    anual = [(*k, v) for k, v in anual.items() if v]
+    if mensual:
+        execute_values(cur, """
+            INSERT INTO estadisticas_mensuales (practica_id, provincia_id, mes, cantidad)
+            VALUES %s
+            ON CONFLICT (practica_id, provincia_id, mes)
+            DO UPDATE SET cantidad = estadisticas_mensuales.cantidad + EXCLUDED.cantidad
+        """, mensual, page_size=len(mensual))
+    if anual:
+        execute_values(cur, """
+            INSERT INTO estadisticas_anuales (practica_id, anio, cantidad)
+            VALUES %s
+            ON CONFLICT (practica_id, anio)
+            DO UPDATE SET cantidad = estadisticas_anuales.cantidad + EXCLUDED.cantidad
+        """, anual, page_size=len(anual))
+    return len(mensual) + len(anual)
+
+
+def reconstruir_resumenes(cur):
+    """Crea (si hace falta) y rearma de cero ambos resúmenes. Devuelve (filas mensuales, filas anuales)."""
+    cur.execute(DDL_RESUMENES)
+    cur.execute("TRUNCATE estadisticas_mensuales, estadisticas_anuales")
+    cur.execute("""
+        INSERT INTO estadisticas_mensuales (practica_id, provincia_id, mes, cantidad)
+        SELECT practica_id, provincia_id, date_trunc('month', fecha)::date, SUM(COALESCE(diaria, 0))
+        FROM estadisticas_diarias
+        GROUP BY 1, 2, 3
+    """)
+    mensuales = cur.rowcount
+    cur.execute("""
+        INSERT INTO estadisticas_anuales (practica_id, anio, cantidad)
+        SELECT practica_id, EXTRACT(YEAR FROM mes)::integer, SUM(cantidad)
+        FROM estadisticas_mensuales
+        WHERE provincia_id = %s
+        GROUP BY 1, 2
+    """, (PROVINCIA_TOTAL,))
+    return mensuales, cur.rowcount
@@ -6,57 +6,344 @@ from selenium.webdriver.support.ui import Select, WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
+from vigilar_descargas import esperar_descarga
+from descarga_http import crear_sesion, descargar_estadisticas_http, leer_formulario
+from estado_json import guardar_json, leer_json
+from huellas import cargar_huellas, clave, guardar_huellas, huella_tabla
+from metricas import contar, guardar_reporte, medir
+import argparse
 import os
-import time
+import re
+import queue
+import shutil
+import subprocess
+import threading
 
-def descargar_estadisticas():
+URL = os.getenv("ENARGAS_URL", "https://www.enargas.gov.ar/secciones/gas-natural-comprimido/estadisticas.php")
+
+PERIODO = "2026"
+
+CARPETA = "descargas_enargas"
+
+CHECKPOINT_BACKFILL = os.path.join("estado", "backfill.json")
+
+# Ruta del chromedriver ya resuelto, por versión de Chrome, para no consultar a webdriver_manager cada corrida
+CACHE_CHROMEDRIVER = os.path.join("estado", "chromedriver.json")
+
+# Recursos que el formulario no necesita. reCAPTCHA (google.com / gstatic.com) no se bloquea.
+URLS_BLOQUEADAS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*facebook.net*", "*hotjar.com*",
+]
+BLOQUEAR_RECURSOS = os.getenv("ENARGAS_BLOQUEAR_RECURSOS", "1") != "0"
+
+CUADROS = [
+    "Conversiones de vehículos",
+    "Desmontajes de equipos en vehículos",
+    "Revisiones periódicas de vehículos",
+    "Modificaciones de equipos en vehículos",
+    "Revisiones de Cilindros",
+    "Cilindro de GNC revisiones CRPC"
+]
+
+# Segundos máximos a esperar cada Excel antes de darlo por fallido
+TIMEOUT_DESCARGA = int(os.getenv("ENARGAS_TIMEOUT_DESCARGA", "60"))
+
+def crear_driver(driver_path, download_dir):
     options = webdriver.ChromeOptions()
     options.add_argument("--headless")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--window-size=1920x1080")
 
-    download_dir = os.path.abspath("descargas_enargas")
-    os.makedirs(download_dir, exist_ok=True)
-
     prefs = {"download.default_directory": download_dir}
     options.add_experimental_option("prefs", prefs)
 
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=options)
-    wait = WebDriverWait(driver, 5)
+    driver = webdriver.Chrome(service=Service(driver_path), options=options)
+    if BLOQUEAR_RECURSOS:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": URLS_BLOQUEADAS})
+        except Exception as e:
+            print(f"⚠️ No pude bloquear imágenes/fuentes: {e}", flush=True)
+    return driver
+
+def version_chrome():
+    """Versión del Chrome instalado (p. ej. '126.0.6478.126'), o None si no se encuentra."""
+    candidatos = [os.getenv("CHROME_BIN"), "chrome", "google-chrome", "google-chrome-stable",
+                  "chromium", "chromium-browser"]
+    for binario in filter(None, candidatos):
+        try:
+            salida = subprocess.run([binario, "--version"], capture_output=True, text=True, timeout=10).stdout
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+        m = re.search(r"\d+(?:\.\d+)+", salida)
+        if m:
+            return m.group(0)
+    return None
+
+def resolver_chromedriver(cache=CACHE_CHROMEDRIVER):
+    """
+    Ruta del chromedriver para el Chrome instalado. Se guarda por versión de
+    Chrome, así las corridas siguientes no vuelven a resolverlo.
+    """
+    version = version_chrome()
+    rutas = leer_json(cache)
+
+    ruta = rutas.get(version) if version else None
+    if ruta and os.access(ruta, os.X_OK):
+        return ruta
+
+    with medir("scraper.chromedriver"):
+        ruta = ChromeDriverManager().install()
+    if version:
+        rutas[version] = ruta
+        guardar_json(cache, rutas)
+    return ruta
 
-    driver.get("https://www.enargas.gov.ar/secciones/gas-natural-comprimido/estadisticas.php")
+def abrir_formulario(driver, wait, periodo=PERIODO):
+    with medir("scraper.driver_get"):
+        driver.get(URL)
 
     Select(wait.until(EC.presence_of_element_located((By.ID, "tipo-consulta-gnc"))))\
         .select_by_visible_text("Prácticas informadas por Tipo de Operación")
     Select(wait.until(EC.presence_of_element_located((By.ID, "periodo"))))\
-        .select_by_visible_text("2026")
-
-    cuadros = [
-        "Conversiones de vehículos",
-        "Desmontajes de equipos en vehículos",
-        "Revisiones periódicas de vehículos",
-        "Modificaciones de equipos en vehículos",
-        "Revisiones de Cilindros",
-        "Cilindro de GNC revisiones CRPC"
+        .select_by_visible_text(periodo)
+
+def descargar_cuadro(driver, wait, cuadro, download_dir, timeout=TIMEOUT_DESCARGA):
+    """Pide el Excel del cuadro y devuelve la ruta apenas el archivo queda completo."""
+    wait.until(EC.text_to_be_present_in_element((By.ID, "cuadro"), cuadro))
+    Select(wait.until(EC.presence_of_element_located((By.ID, "cuadro"))))\
+        .select_by_visible_text(cuadro)
+    wait.until(EC.element_to_be_clickable((By.ID, "btn-ver-xls")))
+    antes = set(os.listdir(download_dir))
+    with medir("scraper.cuadro_selenium"):
+        driver.find_element(By.ID, "btn-ver-xls").click()
+        print(f"⏳ Descargando: {cuadro}", flush=True)
+        ruta = esperar_descarga(download_dir, antes, timeout=timeout)
+    print(f"✅ Descargado: {cuadro} -> {os.path.basename(ruta)}", flush=True)
+    return ruta
+
+def trabajar_cola(n, driver_path, cola, resultados, al_descargar=None):
+    """
+    Worker: abre su propio Chrome headless con su propio directorio de descarga
+    y va tomando trabajos (periodo, cuadro, destino) de la cola compartida
+    hasta vaciarla. Solo recarga la página cuando cambia el período.
+    """
+    download_dir = os.path.abspath(os.path.join(CARPETA, f".worker-{n}"))
+    os.makedirs(download_dir, exist_ok=True)
+
+    with medir("scraper.abrir_navegador"):
+        driver = crear_driver(driver_path, download_dir)
+    wait = WebDriverWait(driver, 5)
+    periodo_actual = None
+    try:
+        while True:
+            try:
+                periodo, cuadro, destino = cola.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                if periodo != periodo_actual:
+                    abrir_formulario(driver, wait, periodo)
+                    periodo_actual = periodo
+                ruta = descargar_cuadro(driver, wait, cuadro, download_dir)
+                destino_ruta = os.path.join(destino, os.path.basename(ruta))
+                os.replace(ruta, destino_ruta)
+                resultados[(periodo, cuadro)] = destino_ruta
+                if al_descargar:
+                    al_descargar(periodo, cuadro, destino_ruta)
+            except Exception as e:
+                print(f"❌ Error al descargar: {cuadro} ({periodo})")
+                print(e)
+                contar("scraper.fallidos")
+                resultados[(periodo, cuadro)] = None
+                periodo_actual = None
+    finally:
+        driver.quit()
+        shutil.rmtree(download_dir, ignore_errors=True)
+
+def ejecutar_trabajos(trabajos, workers=1, motor="auto", al_descargar=None):
+    """
+    Descarga una lista de trabajos (periodo, cuadro, destino).
+    motor: "http" (solo descarga directa), "selenium" (solo navegador) o
+    "auto" (directa primero y Selenium solo para los rechazados).
+    Devuelve {(periodo, cuadro): ruta o None}.
+    """
+    resultados = {}
+    pendientes = list(trabajos)
+
+    if motor in ("http", "auto") and pendientes:
+        sesion = crear_sesion()
+        rechazados = []
+        grupos = {}
+        for periodo, cuadro, destino in pendientes:
+            grupos.setdefault((periodo, destino), []).append(cuadro)
+        for (periodo, destino), cuadros in grupos.items():
+            descargados, no = descargar_estadisticas_http(URL, cuadros, periodo, destino, sesion=sesion)
+            for cuadro, ruta in descargados.items():
+                resultados[(periodo, cuadro)] = ruta
+                if al_descargar:
+                    al_descargar(periodo, cuadro, ruta)
+            rechazados += [(periodo, cuadro, destino) for cuadro in no]
+        pendientes = rechazados
+        if pendientes and motor == "auto":
+            print(f"▶ {len(pendientes)} descargas pasan a Selenium", flush=True)
+
+    if motor == "http" or not pendientes:
+        for periodo, cuadro, _ in pendientes:
+            resultados[(periodo, cuadro)] = None
+        contar("scraper.fallidos", len(pendientes))
+        return resultados
+
+    # Se resuelve una sola vez: varios workers instalando a la vez se pisan
+    driver_path = resolver_chromedriver()
+
+    cola = queue.Queue()
+    for trabajo in pendientes:
+        cola.put(trabajo)
+
+    workers = max(1, min(workers, len(pendientes)))
+    if workers > 1:
+        print(f"▶ Descargando {len(pendientes)} cuadros con {workers} navegadores en paralelo", flush=True)
+    hilos = [
+        threading.Thread(target=trabajar_cola, args=(n, driver_path, cola, resultados, al_descargar))
+        for n in range(workers)
     ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resultados
 
-    for cuadro in cuadros:
+def descargar_estadisticas(workers=1, cuadros=CUADROS, motor="auto", al_descargar=None, huellas=None):
+    """
+    Baja los cuadros del período actual. Devuelve {cuadro: ruta o None}.
+    Si se pasa 'huellas' (ver huellas.py), los cuadros cuya tabla es igual a
+    la de la última corrida se descartan sin llamar a al_descargar ni figurar
+    en el resultado, y 'huellas' queda actualizado con los que cambiaron.
+    """
+    download_dir = os.path.abspath(CARPETA)
+    os.makedirs(download_dir, exist_ok=True)
+
+    sin_cambios = set()
+    lock = threading.Lock()
+
+    def registrar(periodo, cuadro, ruta):
+        if huellas is not None:
+            huella = huella_tabla(ruta)
+            with lock:
+                if huella is not None and huellas.get(clave(periodo, cuadro)) == huella:
+                    sin_cambios.add(cuadro)
+                else:
+                    huellas[clave(periodo, cuadro)] = huella
+            if cuadro in sin_cambios:
+                print(f"⏭️ Sin novedades en ENARGAS: {cuadro}", flush=True)
+                contar("scraper.sin_cambios")
+                os.remove(ruta)
+                return
+        if al_descargar:
+            al_descargar(periodo, cuadro, ruta)
+
+    trabajos = [(PERIODO, cuadro, download_dir) for cuadro in cuadros]
+    resultados = ejecutar_trabajos(trabajos, workers, motor, registrar)
+
+    print("✔️ Descargas finalizadas.")
+    return {cuadro: ruta for (_, cuadro), ruta in resultados.items() if cuadro not in sin_cambios}
+
+def listar_periodos(motor="auto"):
+    """Años disponibles en el select 'periodo' de ENARGAS."""
+    opciones = []
+    if motor in ("http", "auto"):
         try:
-            wait.until(EC.text_to_be_present_in_element((By.ID, "cuadro"), cuadro))
-            Select(wait.until(EC.presence_of_element_located((By.ID, "cuadro"))))\
-                .select_by_visible_text(cuadro)
-            wait.until(EC.element_to_be_clickable((By.ID, "btn-ver-xls")))
-            driver.find_element(By.ID, "btn-ver-xls").click()
-            print(f"✅ Descargando: {cuadro}")
-            time.sleep(20)
+            opciones = list(leer_formulario(crear_sesion(), URL)["selects"]["periodo"]["opciones"])
         except Exception as e:
-            print(f"❌ Error al descargar: {cuadro}")
-            print(e)
+            print(f"⚠️ No pude leer los períodos por HTTP: {e}", flush=True)
+    if not opciones and motor != "http":
+        driver = crear_driver(resolver_chromedriver(), os.path.abspath(CARPETA))
+        try:
+            wait = WebDriverWait(driver, 5)
+            driver.get(URL)
+            Select(wait.until(EC.presence_of_element_located((By.ID, "tipo-consulta-gnc"))))\
+                .select_by_visible_text("Prácticas informadas por Tipo de Operación")
+            periodo = Select(wait.until(EC.presence_of_element_located((By.ID, "periodo"))))
+            opciones = [o.text.strip() for o in periodo.options]
+        finally:
+            driver.quit()
+    return sorted(o for o in opciones if re.fullmatch(r"\d{4}", o))
 
-    driver.quit()
-    print("✔️ Descargas finalizadas.")
+def cargar_checkpoint(ruta=CHECKPOINT_BACKFILL):
+    return leer_json(ruta)
+
+def guardar_checkpoint(hechos, ruta=CHECKPOINT_BACKFILL):
+    guardar_json(ruta, hechos)
+
+def backfill(workers=1, motor="auto", desde=None, hasta=None, checkpoint=CHECKPOINT_BACKFILL):
+    """
+    Descarga todas las combinaciones (periodo x cuadro) disponibles en
+    descargas_enargas/historico/<periodo>/. Retoma desde el checkpoint y
+    saltea lo que ya está en disco.
+    """
+    periodos = [p for p in listar_periodos(motor)
+                if (not desde or p >= str(desde)) and (not hasta or p <= str(hasta))]
+    print(f"📅 Períodos a completar: {', '.join(periodos)}", flush=True)
+
+    hechos = cargar_checkpoint(checkpoint)
+    trabajos = []
+    for periodo in periodos:
+        destino = os.path.abspath(os.path.join(CARPETA, "historico", periodo))
+        os.makedirs(destino, exist_ok=True)
+        for cuadro in CUADROS:
+            ruta = hechos.get(f"{periodo}|{cuadro}")
+            if ruta and os.path.exists(ruta):
+                continue
+            trabajos.append((periodo, cuadro, destino))
+
+    total = len(periodos) * len(CUADROS)
+    print(f"▶ {len(trabajos)} de {total} descargas pendientes", flush=True)
+
+    lock = threading.Lock()
+
+    def registrar(periodo, cuadro, ruta):
+        with lock:
+            hechos[f"{periodo}|{cuadro}"] = ruta
+            guardar_checkpoint(hechos, checkpoint)
+
+    resultados = ejecutar_trabajos(trabajos, workers, motor, registrar)
+    fallidos = [k for k, v in resultados.items() if v is None]
+    for periodo, cuadro in fallidos:
+        print(f"❌ Pendiente para la próxima corrida: {periodo} | {cuadro}", flush=True)
+
+    print("✔️ Backfill finalizado. Para cargarlo:", flush=True)
+    for periodo in periodos:
+        print(f"   python procesar_a_db.py --historico --modo-escritura copy "
+              f"--carpeta {os.path.join(CARPETA, 'historico', periodo)} --periodo {periodo}", flush=True)
+    return resultados
 
 if __name__ == "__main__":
-    descargar_estadisticas()
+    parser = argparse.ArgumentParser(description="Descarga los cuadros de estadísticas GNC de ENARGAS")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("ENARGAS_WORKERS", "1")),
+                        help="cantidad de navegadores en paralelo (1 = secuencial)")
+    parser.add_argument("--motor", choices=("auto", "http", "selenium"),
+                        default=os.getenv("ENARGAS_MOTOR", "auto"),
+                        help="auto: HTTP directo y Selenium como respaldo")
+    parser.add_argument("--backfill", action="store_true",
+                        help="bajar todos los períodos disponibles (retoma desde el checkpoint)")
+    parser.add_argument("--desde", help="primer año a incluir en el backfill")
+    parser.add_argument("--hasta", help="último año a incluir en el backfill")
+    parser.add_argument("--solo-cambios", action="store_true",
+                        help="descartar los cuadros iguales a los de la última corrida (estado/huellas.json)")
+    args = parser.parse_args()
+    try:
+        if args.backfill:
+            backfill(workers=args.workers, motor=args.motor, desde=args.desde, hasta=args.hasta)
+        elif args.solo_cambios:
+            huellas = cargar_huellas()
+            descargar_estadisticas(workers=args.workers, motor=args.motor, huellas=huellas)
+            guardar_huellas(huellas)
+        else:
+            descargar_estadisticas(workers=args.workers, motor=args.motor)
+    finally:
+        guardar_reporte("scraper_enargas")
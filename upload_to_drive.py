@@ -1,50 +1,303 @@
 import os
 import base64
+import hashlib
 import json
-from pydrive2.auth import GoogleAuth
+import threading
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pydrive2.auth import GoogleAuth, ServiceAccountCredentials
 from pydrive2.drive import GoogleDrive
+from pydrive2.files import ApiRequestError
+from estado_json import guardar_json, leer_json
+from manifiesto import abrir_manifiesto, filtrar_pendientes, marcar_etapa, ETAPA_DRIVE
+from metricas import contar, guardar_reporte, medir
+from reintentos import con_reintentos as reintentar
 
-# Leer y decodificar el secreto GDRIVE_CREDENTIALS
-cred_b64 = os.environ.get("GDRIVE_CREDENTIALS")
-if not cred_b64:
-    raise Exception("No se encontró la variable de entorno GDRIVE_CREDENTIALS")
+# Carpeta de destino en Drive (compartida con la cuenta de servicio).
+# Se busca por nombre una vez y el ID queda cacheado; GDRIVE_FOLDER_ID lo fija directamente.
+CARPETA_DESTINO = "ENARGAS_Automatico"
+CARPETA_LOCAL = "descargas_enargas"
 
-cred_json = base64.b64decode(cred_b64).decode("utf-8")
+MIME_CARPETA = "application/vnd.google-apps.folder"
 
-# Guardar temporalmente las credenciales
-os.makedirs("gdrive_auth", exist_ok=True)
-cred_path = "gdrive_auth/credentials.json"
-with open(cred_path, "w") as f:
-    f.write(cred_json)
-    
-from pydrive2.auth import ServiceAccountCredentials
+SCOPES = ["https://www.googleapis.com/auth/drive"]
 
-gauth = GoogleAuth()
-gauth.credentials = ServiceAccountCredentials.from_json_keyfile_name(cred_path, ["https://www.googleapis.com/auth/drive"])
-gauth.Authorize()
+# IDs de carpetas ya resueltos, para no buscarlas por nombre en cada corrida
+RUTA_CACHE = os.path.join("estado", "drive_cache.json")
+CACHE_TTL = int(os.getenv("GDRIVE_CACHE_TTL", str(7 * 24 * 3600)))
 
-drive = GoogleDrive(gauth)
+# Errores de Drive que vale la pena reintentar (cuota, timeouts, 5xx)
+CODIGOS_REINTENTABLES = {403, 408, 429, 500, 502, 503, 504}
+REINTENTOS = 5
+# Resolver / invalidar el ID cacheado de a un hilo por vez (el cache es un solo JSON)
+_lock_carpetas = threading.Lock()
+# Títulos por consulta en listar_remotos (la q de Drive tiene un largo máximo)
+TITULOS_POR_CONSULTA = 40
 
-# ID de la carpeta de destino en Drive (compartida con la cuenta de servicio)
-# ⚠️ Lo ideal es obtenerlo automáticamente. Por ahora lo buscamos por nombre:
-CARPETA_DESTINO = "ENARGAS_Automatico"
 
-# Buscar la carpeta por nombre
-folder_list = drive.ListFile({
-    'q': f"title='{CARPETA_DESTINO}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-}).GetList()
+_drive = None
+
+
+def autenticar():
+    """
+    GoogleDrive autorizado con la cuenta de servicio de GDRIVE_CREDENTIALS.
+    Las credenciales quedan solo en memoria (no se escriben en el runner) y
+    la misma sesión se reutiliza mientras el access token siga vigente.
+    """
+    global _drive
+    if _drive is not None:
+        gauth = _drive.auth
+        if gauth.access_token_expired:
+            gauth.Refresh()
+        return _drive
+
+    # Leer y decodificar el secreto GDRIVE_CREDENTIALS
+    cred_b64 = os.environ.get("GDRIVE_CREDENTIALS")
+    if not cred_b64:
+        raise Exception("No se encontró la variable de entorno GDRIVE_CREDENTIALS")
+
+    cred_info = json.loads(base64.b64decode(cred_b64).decode("utf-8"))
+
+    gauth = GoogleAuth()
+    gauth.credentials = ServiceAccountCredentials.from_json_keyfile_dict(cred_info, SCOPES)
+    gauth.auth_method = "service"
+    gauth.Authorize()
+
+    # Una sola sesión autorizada: pydrive2 arma un http por hilo a partir de ella
+    _drive = GoogleDrive(gauth)
+    return _drive
+
+
+def _leer_cache():
+    return leer_json(RUTA_CACHE)
+
+
+def _guardar_cache(cache):
+    guardar_json(RUTA_CACHE, cache)
+
+
+def invalidar_carpeta(ruta):
+    cache = _leer_cache()
+    if cache.pop(ruta, None) is not None:
+        _guardar_cache(cache)
+
+
+def _buscar_o_crear(drive, nombre, padre=None, crear=False):
+    q = f"title='{nombre}' and mimeType='{MIME_CARPETA}' and trashed=false"
+    if padre:
+        q += f" and '{padre}' in parents"
+    encontradas = drive.ListFile({'q': q}).GetList()
+    if encontradas:
+        return encontradas[0]['id']
+    if not crear:
+        raise Exception(f"No se encontró la carpeta '{nombre}' en tu Google Drive")
+    carpeta = drive.CreateFile({'title': nombre, 'mimeType': MIME_CARPETA, 'parents': [{'id': padre}]})
+    carpeta.Upload()
+    print(f"📁 Carpeta creada en Drive: {nombre}", flush=True)
+    return carpeta['id']
+
+
+def buscar_carpeta(drive, ruta=CARPETA_DESTINO, ttl=CACHE_TTL):
+    """
+    ID de la carpeta 'ruta' ("ENARGAS_Automatico" o "ENARGAS_Automatico/2026-10").
+    La raíz tiene que existir; las subcarpetas fechadas se crean si faltan.
+    Los IDs resueltos se guardan en estado/ con un TTL para no consultarlos cada corrida.
+    """
+    if ruta == CARPETA_DESTINO and os.getenv("GDRIVE_FOLDER_ID"):
+        return os.environ["GDRIVE_FOLDER_ID"]
+
+    cache = _leer_cache()
+    ahora = time.time()
+    entrada = cache.get(ruta)
+    if entrada and entrada["expira"] > ahora:
+        return entrada["id"]
+
+    partes = ruta.strip("/").split("/")
+    folder_id = None
+    for i, nombre in enumerate(partes):
+        parcial = "/".join(partes[:i + 1])
+        entrada = cache.get(parcial)
+        if entrada and entrada["expira"] > ahora:
+            folder_id = entrada["id"]
+            continue
+        folder_id = _buscar_o_crear(drive, nombre, padre=folder_id, crear=i > 0)
+        cache[parcial] = {"id": folder_id, "expira": ahora + ttl}
+
+    _guardar_cache(cache)
+    return folder_id
+
 
-if not folder_list:
-    raise Exception(f"No se encontró la carpeta '{CARPETA_DESTINO}' en tu Google Drive")
+def con_carpeta(drive, operacion, ruta=CARPETA_DESTINO):
+    """
+    Corre operacion(folder_id) con el ID de la carpeta 'ruta'. Si Drive
+    responde 404 (el ID cacheado ya no existe: carpeta borrada o movida),
+    invalida el cache, resuelve el ID de nuevo y repite una vez.
+    Se puede llamar desde varios hilos a la vez.
+    """
+    with _lock_carpetas:
+        folder_id = buscar_carpeta(drive, ruta)
+    try:
+        return operacion(folder_id)
+    except ApiRequestError as e:
+        if (getattr(e, "error", None) or {}).get("code") != 404:
+            raise
+        with _lock_carpetas:
+            # Si otro hilo ya la resolvió de nuevo, no se vuelve a consultar
+            if buscar_carpeta(drive, ruta) == folder_id:
+                invalidar_carpeta(ruta)
+            nuevo_id = buscar_carpeta(drive, ruta)
+        print(f"📁 La carpeta {ruta} de Drive cambió de ID: se vuelve a intentar", flush=True)
+        return operacion(nuevo_id)
 
-folder_id = folder_list[0]['id']
 
-# Subir todos los .xls desde la carpeta local
-carpeta_local = "descargas_enargas"
-for archivo in os.listdir(carpeta_local):
-    if archivo.endswith(".xls"):
-        ruta = os.path.join(carpeta_local, archivo)
-        file_drive = drive.CreateFile({'title': archivo, 'parents': [{'id': folder_id}]})
+def listar_remotos(drive, folder_id, titulos):
+    """
+    Los archivos de la carpeta con esos títulos: {title: archivo}.
+    Se pregunta solo por los que se van a subir, así el tiempo no crece con
+    todo lo que se fue acumulando en la carpeta.
+    """
+    remotos, archivos = {}, []
+    titulos = sorted(set(titulos))
+    with medir("drive.listar"):
+        for i in range(0, len(titulos), TITULOS_POR_CONSULTA):
+            por_titulo = " or ".join(
+                "title='{}'".format(t.replace("\\", "\\\\").replace("'", "\\'"))
+                for t in titulos[i:i + TITULOS_POR_CONSULTA]
+            )
+            archivos += drive.ListFile({
+                'q': f"'{folder_id}' in parents and trashed=false and ({por_titulo})",
+                'fields': "items(id,title,md5Checksum,modifiedDate),nextPageToken",
+                'maxResults': 1000,
+            }).GetList()
+    # Si hay títulos repetidos (corridas viejas subían duplicados) nos quedamos con el más nuevo
+    for archivo in sorted(archivos, key=lambda a: a.get('modifiedDate', '')):
+        remotos[archivo['title']] = archivo
+    return remotos
+
+
+def md5_archivo(ruta):
+    h = hashlib.md5()
+    with open(ruta, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _reintentable(error):
+    if isinstance(error, ApiRequestError):
+        codigo = (getattr(error, "error", None) or {}).get("code")
+        return codigo in CODIGOS_REINTENTABLES
+    return isinstance(error, (OSError, TimeoutError))
+
+
+def con_reintentos(funcion, descripcion, reintentos=REINTENTOS):
+    """Ejecuta funcion() reintentando errores transitorios de Drive (tope de 60s entre intentos)."""
+    return reintentar(funcion, descripcion, _reintentable, reintentos, "drive.reintentos", tope=60.0)
+
+
+def subir_archivo(drive, ruta, folder_id, existente=None):
+    """
+    Sube un archivo con upload resumable. Si ya existe uno con el mismo
+    título se sube una nueva versión en lugar de duplicarlo.
+    """
+    archivo = os.path.basename(ruta)
+
+    def intento():
+        if existente:
+            file_drive = drive.CreateFile({'id': existente['id']})
+        else:
+            file_drive = drive.CreateFile({'title': archivo, 'parents': [{'id': folder_id}]})
         file_drive.SetContentFile(ruta)
-        file_drive.Upload()
-        print(f"✅ Subido a Drive: {archivo}")
+        try:
+            file_drive.Upload()
+        finally:
+            file_drive.content.close()
+        return file_drive
+
+    with medir("drive.subida"):
+        return con_reintentos(intento, f"Subiendo {archivo}")
+
+
+def subir_si_cambio(drive, ruta, folder_id, remotos, manifiesto=None, sha=None):
+    """
+    Sube 'ruta' salvo que la carpeta ya tenga un archivo con el mismo título y md5.
+    Devuelve True si subió algo.
+    """
+    archivo = os.path.basename(ruta)
+    remoto = remotos.get(archivo)
+    if remoto and remoto.get('md5Checksum') == md5_archivo(ruta):
+        print(f"⏭️ Ya está en Drive: {archivo}", flush=True)
+        contar("drive.sin_cambios")
+        subido = False
+    else:
+        subir_archivo(drive, ruta, folder_id, remoto)
+        print(f"✅ Subido a Drive: {archivo}", flush=True)
+        contar("drive.subidos")
+        subido = True
+    if manifiesto is not None and sha is not None:
+        marcar_etapa(manifiesto, sha, ETAPA_DRIVE, archivo)
+    return subido
+
+
+def subir_carpeta(drive, folder_id, carpeta_local=CARPETA_LOCAL, workers=4, manifiesto=None):
+    """
+    Sube en paralelo los .xls nuevos o cambiados de carpeta_local.
+    Devuelve (subidos, errores).
+    """
+    rutas = [os.path.join(carpeta_local, a) for a in sorted(os.listdir(carpeta_local)) if a.endswith(".xls")]
+    if manifiesto is not None:
+        pendientes = filtrar_pendientes(manifiesto, rutas, ETAPA_DRIVE)
+    else:
+        pendientes = [(ruta, None) for ruta in rutas]
+    if not pendientes:
+        return [], []
+
+    remotos = listar_remotos(drive, folder_id, [os.path.basename(ruta) for ruta, _ in pendientes])
+    subidos, errores = [], []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futuros = {
+            pool.submit(subir_si_cambio, drive, ruta, folder_id, remotos, manifiesto, sha): ruta
+            for ruta, sha in pendientes
+        }
+        for futuro in as_completed(futuros):
+            ruta = futuros[futuro]
+            try:
+                if futuro.result():
+                    subidos.append(ruta)
+            except Exception as e:
+                print(f"❌ Error subiendo {os.path.basename(ruta)}: {e!r}", flush=True)
+                errores.append(ruta)
+    return subidos, errores
+
+
+def main(workers=4, subcarpeta=None):
+    drive = autenticar()
+    ruta = CARPETA_DESTINO
+    if subcarpeta:
+        ruta += "/" + datetime.now().strftime(subcarpeta)
+
+    manifiesto = abrir_manifiesto()
+    try:
+        subidos, errores = con_carpeta(
+            drive, lambda folder_id: subir_carpeta(drive, folder_id, workers=workers, manifiesto=manifiesto), ruta)
+    finally:
+        manifiesto.close()
+
+    print(f"✔️ Drive: {len(subidos)} subidos, {len(errores)} con error", flush=True)
+    if errores:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sube a Google Drive los .xls descargados de ENARGAS")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("GDRIVE_WORKERS", "4")),
+                        help="subidas en paralelo")
+    parser.add_argument("--subcarpeta", default=os.getenv("GDRIVE_SUBCARPETA"),
+                        help="subcarpeta fechada con formato strftime, p. ej. %%Y-%%m")
+    args = parser.parse_args()
+    try:
+        main(workers=args.workers, subcarpeta=args.subcarpeta)
+    finally:
+        guardar_reporte("upload_to_drive")
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Espera a que Chrome termine de bajar un archivo en un directorio.
+
+En Linux se usa inotify (vía ctypes, sin dependencias extra) para despertar
+apenas Chrome renombra el .crdownload al nombre final. En otros sistemas,
+o si inotify no está disponible, se cae a un polling corto que exige que
+el tamaño del archivo se mantenga estable entre dos lecturas.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+EXTENSIONES_PARCIALES = (".crdownload", ".tmp", ".part")
+
+# Constantes de <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+EVENTO = struct.Struct("iIII")
+
+
+def _descarga_en_curso(nombres):
+    return any(n.endswith(EXTENSIONES_PARCIALES) for n in nombres)
+
+
+def _nuevos_terminados(directorio, antes):
+    """Archivos nuevos (no estaban en 'antes') que no son parciales."""
+    actuales = set(os.listdir(directorio))
+    nuevos = [n for n in (actuales - antes) if not n.endswith(EXTENSIONES_PARCIALES)]
+    return actuales, nuevos
+
+
+def _mas_reciente(directorio, nombres):
+    rutas = [os.path.join(directorio, n) for n in nombres]
+    return max(rutas, key=os.path.getmtime)
+
+
+def _abrir_inotify(directorio):
+    """Devuelve un fd de inotify vigilando el directorio, o None si no se puede."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        wd = libc.inotify_add_watch(fd, os.fsencode(directorio), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+        if wd < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+def _leer_eventos(fd):
+    """Nombres de los archivos cerrados tras escritura o renombrados al directorio."""
+    finalizados = set()
+    try:
+        datos = os.read(fd, 64 * 1024)
+    except BlockingIOError:
+        return finalizados
+    i = 0
+    while i + EVENTO.size <= len(datos):
+        _, mask, _, largo = EVENTO.unpack_from(datos, i)
+        nombre = datos[i + EVENTO.size:i + EVENTO.size + largo].rstrip(b"\0")
+        i += EVENTO.size + largo
+        if nombre and mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            finalizados.add(os.fsdecode(nombre))
+    return finalizados
+
+
+def esperar_descarga(directorio, antes, timeout=60, intervalo=0.25):
+    """
+    Espera a que aparezca un archivo nuevo y terminado en 'directorio'
+    (distinto de los nombres en 'antes') y devuelve su ruta completa.
+    Lanza TimeoutError si no aparece nada dentro de 'timeout' segundos.
+    """
+    antes = set(antes)
+    limite = time.monotonic() + timeout
+    fd = _abrir_inotify(directorio)
+    tamanios = {}
+    finalizados = set()
+
+    try:
+        while True:
+            actuales, nuevos = _nuevos_terminados(directorio, antes)
+
+            if nuevos and not _descarga_en_curso(actuales):
+                listos = []
+                for nombre in nuevos:
+                    try:
+                        tamanio = os.path.getsize(os.path.join(directorio, nombre))
+                    except FileNotFoundError:
+                        continue
+                    # Con inotify el rename/close de Chrome ya marca el final;
+                    # con polling pedimos el mismo tamaño en dos lecturas seguidas.
+                    if tamanio > 0 and (nombre in finalizados or tamanios.get(nombre) == tamanio):
+                        listos.append(nombre)
+                    tamanios[nombre] = tamanio
+                if listos:
+                    return _mas_reciente(directorio, listos)
+
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                raise TimeoutError(f"No apareció ninguna descarga en {directorio} dentro de {timeout}s")
+
+            if fd is None:
+                time.sleep(min(intervalo, restante))
+            else:
+                # Si hay un candidato pendiente de estabilizar, volvemos a mirar pronto
+                espera = min(intervalo, restante) if nuevos else restante
+                listos, _, _ = select.select([fd], [], [], espera)
+                if listos:
+                    finalizados |= _leer_eventos(fd)
+    finally:
+        if fd is not None:
+            os.close(fd)